@@ -0,0 +1,284 @@
+import sys
+import os
+import json
+import heapq
+from contextlib import contextmanager
+
+CHECKPOINT_FILE = ".checkpoint"
+PYTHON_BACKEND = "python"
+NUMPY_BACKEND = "numpy"
+KEEP = "keep"
+SKIP = "skip"
+
+def read_skip_list(file_path):
+    """
+    Names without extension of the inputs marked as duplicates in a skip
+    list written by dedup.py, so that e.g. book.txt also skips book.tagged and
+    book.unigrams.
+    """
+    skipped = set()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) > 1 and fields[1] == SKIP:
+                skipped.add(os.path.splitext(fields[0])[0])
+    return skipped
+
+def list_files(directory):
+    """
+    Sorted input files of a directory. Hidden files (checkpoints, temporary
+    files) are skipped.
+    """
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory))
+            if not f.startswith('.') and os.path.isfile(os.path.join(directory, f))]
+
+def list_documents(directory):
+    """
+    Sorted corpus files of a directory (raw texts or the per-document files
+    derived from them), without the duplicates of the skip list named by
+    DICCIONARIOS_SKIP_LIST. A missing or unreadable skip list is reported
+    and ignored.
+    """
+    files = list_files(directory)
+    skip_list = os.environ.get("DICCIONARIOS_SKIP_LIST")
+    if not skip_list:
+        return files
+    try:
+        skipped = read_skip_list(skip_list)
+    except OSError as e:
+        print(f"Warning. Cannot read skip list {skip_list}: {e}. Processing every input.")
+        return files
+    kept = [f for f in files if os.path.splitext(os.path.basename(f))[0] not in skipped]
+    if len(kept) < len(files):
+        print(f"Skipping {len(files) - len(kept)} duplicate inputs listed in {skip_list}")
+    return kept
+
+def list_inputs(input_path):
+    """
+    Input files of a command: the files of a directory or a single file.
+    """
+    if os.path.isdir(input_path):
+        return list_files(input_path)
+    return [input_path]
+
+@contextmanager
+def atomic_write(file_path, mode='w', encoding='utf-8'):
+    """
+    Open a temporary file next to file_path and rename it over file_path once
+    the block completes, so a crash never leaves a truncated output.
+    """
+    directory, name = os.path.split(file_path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    f = open(tmp_path, mode, encoding=None if 'b' in mode else encoding)
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+
+def file_identity(file_path):
+    st = os.stat(file_path)
+    return st.st_size, st.st_mtime_ns
+
+def current_memory():
+    """
+    Resident memory of the process in bytes (peak resident memory where the
+    current value is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def memory_limit():
+    """
+    Memory ceiling in bytes from DICCIONARIOS_MEMORY_LIMIT_MB, None if unset.
+    """
+    limit = os.environ.get("DICCIONARIOS_MEMORY_LIMIT_MB")
+    return int(limit) * 1024 * 1024 if limit else None
+
+def count_backend():
+    """
+    Counting backend of the create commands from DICCIONARIOS_COUNT_BACKEND:
+    PYTHON_BACKEND (default) or NUMPY_BACKEND (chunked, see ngrams.py).
+    """
+    backend = os.environ.get("DICCIONARIOS_COUNT_BACKEND", PYTHON_BACKEND)
+    if backend not in (PYTHON_BACKEND, NUMPY_BACKEND):
+        raise ValueError(f"Unknown counting backend: {backend}")
+    return backend
+
+class Checkpoint:
+    """
+    Append-only journal of completed inputs. Every entry records the size and
+    modification time of the input and the settings of the run (the command
+    and e.g. the threshold), so changed inputs or settings are processed
+    again and commands sharing an output directory do not skip each other's
+    inputs; a partially written last entry is ignored.
+    """
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        self.settings = settings
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("settings") == settings:
+                        self.done[entry["input"]] = entry
+
+    def is_done(self, input_path):
+        entry = self.done.get(os.path.abspath(input_path))
+        if entry is None or not os.path.exists(entry["output"]):
+            return False
+        try:
+            return [entry["size"], entry["mtime_ns"]] == list(file_identity(input_path))
+        except OSError:
+            return False
+
+    def is_valid(self):
+        return all(self.is_done(input_path) for input_path in self.done)
+
+    def outputs(self):
+        return sorted({entry["output"] for entry in self.done.values()})
+
+    def record(self, input_path, output):
+        size, mtime_ns = file_identity(input_path)
+        entry = {"input": os.path.abspath(input_path), "size": size, "mtime_ns": mtime_ns,
+                 "output": output, "settings": self.settings}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[entry["input"]] = entry
+
+    def clear(self):
+        self.done = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def restart():
+    """
+    Replace the process by a fresh run of the same command line (the whole
+    chain when run through diccionarios.py); completed inputs are skipped
+    through the checkpoint.
+    """
+    sys.stdout.flush()
+    os.execv(sys.executable, getattr(sys, "orig_argv", [sys.executable] + sys.argv))
+
+def run_batch(inputs, process, checkpoint, limit=None):
+    """
+    Process input files one by one with per-file checkpoints.
+
+    Inputs already completed are skipped, a failing input is reported and
+    left out of the checkpoint so the next run retries it, and the process
+    restarts itself when its memory exceeds limit.
+
+    Args:
+        inputs: Input files
+        process: Function input path -> output path; it must write its
+            output atomically and raise on failure
+        checkpoint: Checkpoint of the batch
+        limit: Memory ceiling in bytes, None for no ceiling
+    """
+    for input_path in inputs:
+        if checkpoint.is_done(input_path):
+            print(f"Already processed: {input_path}. Skipping.")
+            continue
+        try:
+            output = process(input_path)
+        except Exception as e:
+            print(f"Error processing file {input_path}: {e}")
+            continue
+        checkpoint.record(input_path, output)
+        if limit is not None and current_memory() > limit:
+            print(f"Memory limit exceeded after {input_path}. Restarting.")
+            restart()
+
+def merge_counts(streams):
+    """
+    Merge sorted (key, count) streams, summing the counts of equal keys.
+    """
+    current, total = None, 0
+    for key, count in heapq.merge(*streams, key=lambda entry: entry[0]):
+        if key != current:
+            if current is not None:
+                yield current, total
+            current, total = key, 0
+        total += count
+    if current is not None:
+        yield current, total
+
+def merge_batch(inputs, output_file, read, iterate, write, threshold=0, limit=None):
+    """
+    Merge count tables with bounded memory and per-file checkpoints.
+
+    Counts are accumulated in memory; when the process exceeds limit they are
+    spilled to a sorted run file and the inputs they cover are checkpointed.
+    The runs and the remaining counts are merged into output_file at the end.
+    An interrupted merge resumes from its runs; if an input changed or was
+    dropped from inputs since, the merge starts over.
+
+    Args:
+        inputs: Count files
+        output_file: Merged output file
+        read: Function path -> dictionary key -> count
+        iterate: Function path -> sorted (key, count) stream
+        write: Function (path, sorted (key, count) entries, threshold)
+        threshold: Minimum count written to the output
+        limit: Memory ceiling in bytes, None for no ceiling
+    """
+    runs_dir = f"{output_file}.runs"
+    checkpoint = Checkpoint(os.path.join(runs_dir, CHECKPOINT_FILE))
+    if not checkpoint.is_valid() or set(checkpoint.done) - {os.path.abspath(p) for p in inputs}:
+        print("Inputs changed since the interrupted merge. Starting over.")
+        for run in checkpoint.outputs():
+            if os.path.exists(run):
+                os.remove(run)
+        checkpoint.clear()
+    if not os.path.isdir(runs_dir):
+        os.makedirs(runs_dir)
+
+    merged, pending = {}, []
+    max_entries = None
+    for input_path in inputs:
+        if checkpoint.is_done(input_path):
+            print(f"Already merged: {input_path}. Skipping.")
+            continue
+        try:
+            print(f"Merging counts from file: {input_path}")
+            table = read(input_path)
+        except Exception as e:
+            print(f"Error reading count file {input_path}: {e}")
+            continue
+        for key, count in table.items():
+            merged[key] = merged.get(key, 0) + count
+        pending.append(input_path)
+
+        # the first time the ceiling is hit fixes the table size that fits
+        if max_entries is None and limit is not None and current_memory() > limit:
+            max_entries = max(len(merged), 1)
+        if max_entries is not None and len(merged) >= max_entries:
+            run = os.path.join(runs_dir, f"run-{len(checkpoint.outputs()):05d}")
+            write(run, sorted(merged.items()), 0)
+            for path in pending:
+                checkpoint.record(path, run)
+            print(f"Spilled {len(merged)} entries to: {run}")
+            merged, pending = {}, []
+
+    import shutil
+
+    runs = checkpoint.outputs()
+    write(output_file, merge_counts([iterate(run) for run in runs] + [iter(sorted(merged.items()))]), threshold)
+    shutil.rmtree(runs_dir)
@@ -1,56 +1,113 @@
 import sys
 import os
-import numpy as np
 import json
-import re
+from itertools import compress, repeat
+from operator import itemgetter
 
 from preprocess import stopwords
+from ngramfile import iter_table, read_table, read_table_chunks, write_table, write_entries, migrate_table
+from tokenizer import iter_phrase_chunks, PHRASE_BREAK
+from querycache import reusable_table
+from batch import list_files, list_documents, Checkpoint, CHECKPOINT_FILE, run_batch, merge_batch, memory_limit, count_backend, NUMPY_BACKEND
 
 def help():
     print("Usage: python analysis.py <command>")
     print("List of commands:")
     print("  ")
 
-def read_bigrams(file_path):
-    bigrams = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                
-                parts = line.strip().split('\t')
-                if len(parts) == 2:
-                    bigram_str, count = parts
-                    #print(bigram_str, count)
-                    bigram = tuple(json.loads(bigram_str))
-                    bigrams[bigram] = int(count)
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-    return bigrams
+def parse_legacy_bigram(line):
+    parts = line.strip().split('\t')
+    if len(parts) != 2:
+        return None
+    return tuple(json.loads(parts[0])), int(parts[1])
 
-def count_bigrams(file_path):
+@reusable_table
+def read_bigrams(file_path):
+    return read_table(file_path, parse_legacy_bigram)
+
+def read_bigrams_chunks(file_path):
+    """
+    Read a bigrams file in chunks.
+
+    Yields:
+        Lists of (bigram, count) tuples in file order
+    """
+    return read_table_chunks(file_path, parse_legacy_bigram)
+
+def bigram_id_chunks(file_path, ids, min_count=0):
+    """
+    Read a bigrams file in chunks of word id arrays.
+
+    Args:
+        file_path: Path to the bigrams file
+        ids: Dictionary word -> id; bigrams with other words are skipped
+        min_count: Skip bigrams with a lower count
+    Yields:
+        Tuples (first word ids, second word ids, counts) of int64 arrays
+    """
+    import numpy as np
+
+    for chunk in read_bigrams_chunks(file_path):
+        if not chunk:
+            empty = np.empty(0, dtype=np.int64)
+            yield empty, empty, empty
+            continue
+        # counts are filtered first, so only the remaining words are looked
+        # up (with map, -1 if unknown)
+        counts = np.fromiter(map(itemgetter(1), chunk), dtype=np.int64, count=len(chunk))
+        frequent = counts >= min_count
+        keys = list(compress(map(itemgetter(0), chunk), frequent.tolist()))
+        first = np.fromiter(map(ids.get, map(itemgetter(0), keys), repeat(-1)), dtype=np.int64, count=len(keys))
+        second = np.fromiter(map(ids.get, map(itemgetter(1), keys), repeat(-1)), dtype=np.int64, count=len(keys))
+        counts = counts[frequent]
+        known = (first >= 0) & (second >= 0)
+        yield first[known], second[known], counts[known]
+
+def iter_bigrams(file_path, query=None, min_count=None, max_count=None, predicate=None):
+    """
+    Stream the entries of a bigrams file that pass the given filters.
+
+    Args:
+        file_path: Path to the bigrams file
+        query: Optional (word1, word2) pattern, "*" matches any word. When the
+            first word is fixed the sorted file order is used to jump directly
+            to its range.
+        min_count: Minimum count (inclusive)
+        max_count: Maximum count (inclusive)
+        predicate: Optional function bigram -> bool
+    Yields:
+        (bigram, count) tuples in file order
+    """
+    return iter_table(file_path, parse_legacy_bigram, query, min_count, max_count, predicate)
+
+def count_bigrams(file_path, backend=None):
+    """
+    Count the bigrams of every phrase of a text file.
+
+    Args:
+        file_path: Path to the file to process
+        backend: PYTHON_BACKEND or NUMPY_BACKEND, count_backend() if None
+    Returns:
+        Dictionary with bigram tuples as keys and counts as values
+    """
     bigrams = {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                sentences = re.sub(r'[^a-zA-Záéíóúüñ ]', '\n', line.lower()).split('\n')
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if not sentence:
-                        continue
-                    words = sentence.split()
-                    for i in range(len(words) - 1):
-                        bigram = (words[i].lower(), words[i + 1].lower())
-                        bigrams[bigram] = bigrams.get(bigram, 0) + 1
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
+    backend = backend or count_backend()
+    if backend == NUMPY_BACKEND:
+        from ngrams import count_ngrams, WORDS
+        return count_ngrams([file_path], WORDS, ["xx"])["xx"]
+    for chunk in iter_phrase_chunks(file_path):
+        for bigram in zip(chunk, chunk[1:]):
+            bigrams[bigram] = bigrams.get(bigram, 0) + 1
+    # pairs with a phrase break span two phrases
+    for bigram in [bigram for bigram in bigrams if PHRASE_BREAK in bigram]:
+        del bigrams[bigram]
     return bigrams
 
 def write_bigrams(file_path, bigrams, threshold=0):
-    with open(file_path, 'w', encoding='utf-8') as out_f:
-        for bigram, count in sorted(bigrams.items()):
-            if count >= threshold:
-                json.dump(list(bigram), out_f, ensure_ascii=False)
-                out_f.write(f"\t{count}\n")
+    write_table(file_path, "bigrams", bigrams, threshold)
+
+def write_bigram_entries(file_path, entries, threshold=0):
+    write_entries(file_path, "bigrams", entries, threshold)
 
 def print_bigrams_filtered(bigrams, threshold):
     for bigram, count in bigrams.items():
@@ -64,6 +121,8 @@ def query_bigrams(bigrams, query, threshold):
                 print(f"'{bigram}'\t{count}")
 
 def make_noun_ft_array(target, bigrams):
+    import numpy as np
+
     result = []
     tsum = 0
     for stopword in stopwords:    
@@ -77,6 +136,7 @@ def make_noun_ft_array(target, bigrams):
         return np.array(result)
     return np.array(result)/tsum
 
+@reusable_table
 def read_tagged(file_path):
     result = {}
     current = []
@@ -114,7 +174,11 @@ def main():
         output_file = sys.argv[3]
         threshold = int(sys.argv[4])
 
-        bigrams = count_bigrams(input_file)
+        try:
+            bigrams = count_bigrams(input_file)
+        except Exception as e:
+            print(f"Error processing file {input_file}: {e}")
+            sys.exit(1)
         write_bigrams(output_file, bigrams, threshold)
 
     elif command == "create-batch":
@@ -134,22 +198,15 @@ def main():
             print("Error. Provided output directory does not exist. Exiting.")
             sys.exit(1)
 
-        for f in os.listdir(input_directory):
-            input_file = os.path.join(input_directory, f)
-            bigrams = None
-            if os.path.isfile(input_file):
-                print(f"Processing input file: {input_file}")
-                bigrams = count_bigrams(input_file)
+        def create(input_file):
+            print(f"Processing input file: {input_file}")
+            output_file = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_file))[0]}.bigrams")
+            write_bigrams(output_file, count_bigrams(input_file), threshold)
+            print(f"Dictionary written: {output_file}")
+            return output_file
 
-            if bigrams is not None:
-                output_file = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_file))[0]}.bigrams")
-                try:
-                    write_bigrams(output_file, bigrams, threshold)
-
-                    print(f"Input file: {input_file}")
-                    print(f"Dictionary written: {output_file}")
-                except Exception as e:
-                    print(f"Error writing to output file {output_file}: {e}")
+        checkpoint = Checkpoint(os.path.join(output_directory, CHECKPOINT_FILE), {"command": "bigrams create-batch", "threshold": threshold})
+        run_batch(list_documents(input_directory), create, checkpoint, memory_limit())
 
     elif command == "merge-batch":
         if len(sys.argv) < 5:
@@ -159,7 +216,6 @@ def main():
         input_directory = sys.argv[2]
         output_file = sys.argv[3]
         threshold = int(sys.argv[4])
-        merged_dict = {}
 
         if not os.path.isdir(input_directory):
             print("Error. Provided input directory does not exist. Exiting.")
@@ -170,21 +226,32 @@ def main():
             print("Error. Parent directory of output file does not exist. Exiting.")
             sys.exit(1)
 
-        for f in os.listdir(input_directory):
-            dict_file = os.path.join(input_directory, f)
-            if os.path.isfile(dict_file):
-                try:
-                    dictionary = read_bigrams(dict_file)
-                    for word, count in dictionary.items():
-                        merged_dict[word] = merged_dict.get(word, 0) + int(count)
-                except Exception as e:
-                    print(f"Error reading dictionary file {dict_file}: {e}")
-
-            try:
-                write_bigrams(output_file, merged_dict, threshold)
-                print(f"Merged dictionary {dict_file} written to {output_file}")
-            except Exception as e:
-                print(f"Error writing to output file {output_file}: {e}")
+        merge_batch(list_files(input_directory), output_file, read_bigrams, iter_bigrams,
+                    write_bigram_entries, threshold, memory_limit())
+        print(f"Merged dictionary written to {output_file}")
+
+    elif command == "query":
+        if len(sys.argv) < 6:
+            print("Usage: python bigrams.py query <input_file> <word1|*> <word2|*> threshold")
+            sys.exit(1)
+
+        input_file = sys.argv[2]
+        query = (sys.argv[3], sys.argv[4])
+        threshold = int(sys.argv[5])
+
+        for bigram, count in iter_bigrams(input_file, query=query, min_count=threshold):
+            print(f"'{bigram}'\t{count}")
+
+    elif command == "migrate":
+        if len(sys.argv) < 3:
+            print("Usage: python bigrams.py migrate <input_file> [output_file]")
+            sys.exit(1)
+
+        input_file = sys.argv[2]
+        output_file = sys.argv[3] if len(sys.argv) > 3 else input_file
+
+        migrate_table(input_file, output_file, "bigrams", parse_legacy_bigram)
+        print(f"Bigrams written to: {output_file}")
 
     else:
         print(f"Unknown command: {command}")
@@ -0,0 +1,160 @@
+import sys
+import os
+
+import numpy as np
+
+from unigrams import read_unigrams
+from bigrams import bigram_id_chunks
+
+MEASURES = ["pmi", "g2", "t", "dice"]
+
+def help():
+    print("Usage: python collocations.py <command>")
+    print("List of commands:")
+    print("  rank <bigrams_file> <unigrams_file> <output_file> <pmi|g2|t|dice> <min_count> [top_k]")
+
+def xlogy(x, y):
+    """
+    x * log(y) with 0 * log(0) = 0.
+    """
+    return np.where(x > 0, x * np.log(np.where(x > 0, y, 1)), 0.0)
+
+def association_measures(c12, c1, c2, n):
+    """
+    Compute association measures for arrays of bigram counts.
+
+    Args:
+        c12: Bigram counts
+        c1: Counts of the first words
+        c2: Counts of the second words
+        n: Total number of tokens
+    Returns:
+        Dictionary measure name -> array (pmi, g2, t, dice)
+    """
+    c12 = c12.astype(np.float64)
+    c1 = c1.astype(np.float64)
+    c2 = c2.astype(np.float64)
+
+    # 2x2 contingency table; marginals come from the unigram table, which is
+    # tokenized slightly differently, so cells are clamped at zero
+    o11 = c12
+    o12 = np.maximum(c1 - c12, 0)
+    o21 = np.maximum(c2 - c12, 0)
+    o22 = np.maximum(n - c1 - c2 + c12, 0)
+    e11 = c1 * c2 / n
+    e12 = c1 * (n - c2) / n
+    e21 = (n - c1) * c2 / n
+    e22 = (n - c1) * (n - c2) / n
+
+    g2 = 2 * (xlogy(o11, o11 / e11) + xlogy(o12, o12 / np.maximum(e12, 1e-300)) +
+              xlogy(o21, o21 / np.maximum(e21, 1e-300)) + xlogy(o22, o22 / np.maximum(e22, 1e-300)))
+    return {
+        "pmi": np.log2(c12 * n / (c1 * c2)),
+        "g2": g2,
+        "t": (c12 - e11) / np.sqrt(c12),
+        "dice": 2 * c12 / (c1 + c2),
+    }
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, highest first.
+    """
+    if k is not None and k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def rank_collocations(bigrams_file, unigrams_file, measure="g2", min_count=0, k=None):
+    """
+    Rank the bigrams of a merged table by an association measure.
+
+    The bigram table is processed chunk by chunk. When k is given only the
+    current best k entries are kept between chunks; otherwise the chunks are
+    concatenated once at the end.
+
+    Args:
+        bigrams_file: Merged .bigrams file
+        unigrams_file: Merged .unigrams file with the marginal counts
+        measure: Measure used for ranking (pmi, g2, t or dice)
+        min_count: Minimum bigram count
+        k: Number of bigrams to keep, None for all
+    Returns:
+        Tuple (vocabulary, first ids, second ids, counts, measures) sorted by
+        the ranking measure, measures being a dictionary of arrays
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"Unknown measure: {measure}")
+
+    unigrams = read_unigrams(unigrams_file)
+    vocab = sorted(unigrams)
+    ids = {word: i for i, word in enumerate(vocab)}
+    marginals = np.array([unigrams[word] for word in vocab], dtype=np.int64)
+    n = float(marginals.sum())
+
+    ranked = 3 + MEASURES.index(measure)
+    chunks = []
+    for first, second, counts in bigram_id_chunks(bigrams_file, ids, min_count):
+        if len(counts) == 0:
+            continue
+        scores = association_measures(counts, marginals[first], marginals[second], n)
+        chunk = [first, second, counts] + [scores[m] for m in MEASURES]
+        if k is None:
+            chunks.append(chunk)
+            continue
+        if chunks:
+            chunk = [np.concatenate((a, b)) for a, b in zip(chunks[0], chunk)]
+        keep = top_k(chunk[ranked], k)
+        chunks = [[column[keep] for column in chunk]]
+
+    if not chunks:
+        empty = np.empty(0, dtype=np.int64)
+        return vocab, empty, empty, empty, {m: np.empty(0) for m in MEASURES}
+    best = [np.concatenate(columns) for columns in zip(*chunks)]
+    order = top_k(best[ranked], k)
+    best = [column[order] for column in best]
+    return vocab, best[0], best[1], best[2], dict(zip(MEASURES, best[3:]))
+
+def write_collocations(file_path, vocab, first, second, counts, measures):
+    with open(file_path, 'w', encoding='utf-8') as out_f:
+        out_f.write("#word1\tword2\tcount\t" + "\t".join(MEASURES) + "\n")
+        for row in range(len(counts)):
+            values = "\t".join(f"{measures[m][row]:.4f}" for m in MEASURES)
+            out_f.write(f"{vocab[first[row]]}\t{vocab[second[row]]}\t{counts[row]}\t{values}\n")
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "rank":
+        if len(sys.argv) < 7:
+            print("Usage: python collocations.py rank <bigrams_file> <unigrams_file> <output_file> <pmi|g2|t|dice> <min_count> [top_k]")
+            sys.exit(1)
+
+        bigrams_file = sys.argv[2]
+        unigrams_file = sys.argv[3]
+        output_file = sys.argv[4]
+        measure = sys.argv[5]
+        min_count = int(sys.argv[6])
+        k = int(sys.argv[7]) if len(sys.argv) > 7 else None
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.isdir(output_dir):
+            print("Error. Parent directory of output file does not exist. Exiting.")
+            sys.exit(1)
+
+        result = rank_collocations(bigrams_file, unigrams_file, measure, min_count, k)
+        write_collocations(output_file, *result)
+        print(f"Collocations written to: {output_file}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
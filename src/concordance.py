@@ -0,0 +1,262 @@
+import sys
+import os
+import mmap
+from array import array
+
+import numpy as np
+
+from index import get_id, group_by_key, position_dtype, write_vocab, read_vocab, contains
+from batch import list_inputs
+
+WORD_VOCAB = "words.vocab"
+TAG_VOCAB = "tags.vocab"
+FILES_FILE = "files.txt"
+PAGE_SIZE = 20
+
+def help():
+    print("Usage: python concordance.py <command>")
+    print("List of commands:")
+    print("  build <tagged_path> <index_directory>")
+    print("  query <index_directory> <pattern> [page] [page_size] [width]")
+    print("  interactive <index_directory> [page_size] [width]")
+    print("Pattern elements: word, /TAG, word/TAG or * (any token)")
+
+def build_concordance(paths, index_dir):
+    """
+    Index the lines of tagged files by the words and tags they contain.
+
+    Every line is identified by its file and byte offset, so a query only
+    reads the lines that contain all its words and tags.
+
+    Args:
+        paths: Tagged files (output of tagger.py)
+        index_dir: Directory where the index is written
+    """
+    words, tags = [], []
+    word_index, tag_index = {}, {}
+    line_files, line_offsets = array('i'), array('q')
+    word_keys, word_lines, tag_keys, tag_lines = array('i'), array('i'), array('i'), array('i')
+    for file_id, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            offset = 0
+            for raw_line in f:
+                line_id = len(line_offsets)
+                line_files.append(file_id)
+                line_offsets.append(offset)
+                offset += len(raw_line)
+                line_words, line_tags = set(), set()
+                for token in raw_line.decode('utf-8').split():
+                    parts = token.split('/')
+                    if len(parts) < 2:
+                        continue
+                    line_words.add(get_id(words, word_index, parts[0]))
+                    line_tags.add(get_id(tags, tag_index, parts[1]))
+                word_keys.extend(line_words)
+                word_lines.extend([line_id] * len(line_words))
+                tag_keys.extend(line_tags)
+                tag_lines.extend([line_id] * len(line_tags))
+
+    nlines = len(line_offsets)
+    for name, vocab, keys, lines in (("word", words, word_keys, word_lines), ("tag", tags, tag_keys, tag_lines)):
+        positions, offsets = group_by_key(np.frombuffer(keys, dtype=np.int32), len(vocab))
+        postings = np.frombuffer(lines, dtype=np.int32)[positions]
+        np.save(os.path.join(index_dir, f"{name}_lines.npy"), postings.astype(position_dtype(nlines)))
+        np.save(os.path.join(index_dir, f"{name}_offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "line_files.npy"), np.frombuffer(line_files, dtype=np.int32))
+    np.save(os.path.join(index_dir, "line_offsets.npy"), np.frombuffer(line_offsets, dtype=np.int64))
+    write_vocab(os.path.join(index_dir, WORD_VOCAB), words)
+    write_vocab(os.path.join(index_dir, TAG_VOCAB), tags)
+    write_vocab(os.path.join(index_dir, FILES_FILE), [os.path.abspath(path) for path in paths])
+
+def load_concordance(index_dir):
+    """
+    Open an index built by build_concordance. Arrays are memory-mapped and
+    the tagged files are mapped on first use.
+    """
+    index = {"files": read_vocab(os.path.join(index_dir, FILES_FILE)), "maps": {}}
+    for name, vocab_file in (("word", WORD_VOCAB), ("tag", TAG_VOCAB)):
+        vocab = read_vocab(os.path.join(index_dir, vocab_file))
+        index[f"{name}_ids"] = {key: i for i, key in enumerate(vocab)}
+        index[f"{name}_lines"] = np.load(os.path.join(index_dir, f"{name}_lines.npy"), mmap_mode='r')
+        index[f"{name}_offsets"] = np.load(os.path.join(index_dir, f"{name}_offsets.npy"), mmap_mode='r')
+    index["line_files"] = np.load(os.path.join(index_dir, "line_files.npy"), mmap_mode='r')
+    index["line_offsets"] = np.load(os.path.join(index_dir, "line_offsets.npy"), mmap_mode='r')
+    return index
+
+def parse_pattern(pattern):
+    """
+    Parse a pattern such as "la/LA * de" or "/LA /UNK /NFS".
+
+    Returns:
+        List of (word, tag) tuples, None meaning any
+    """
+    elements = []
+    for element in pattern.split():
+        if element == "*":
+            elements.append((None, None))
+        elif '/' in element:
+            word, tag = element.split('/', 1)
+            elements.append((word or None, tag or None))
+        else:
+            elements.append((element, None))
+    return elements
+
+def line_postings(index, field, key):
+    key_id = index[f"{field}_ids"].get(key)
+    if key_id is None:
+        return np.empty(0, dtype=np.int64)
+    offsets = index[f"{field}_offsets"]
+    return index[f"{field}_lines"][offsets[key_id]:offsets[key_id + 1]]
+
+def candidate_lines(index, elements):
+    """
+    Sorted ids of the lines containing every word and tag of the pattern.
+    The shortest posting list is probed against the others.
+    """
+    lists = [line_postings(index, "word", word) for word, _ in elements if word is not None]
+    lists += [line_postings(index, "tag", tag) for _, tag in elements if tag is not None]
+    if not lists:
+        return np.arange(len(index["line_offsets"]))
+    lists.sort(key=len)
+    result = np.asarray(lists[0], dtype=np.int64)
+    for lines in lists[1:]:
+        if len(result) == 0:
+            break
+        result = result[contains(lines, result)]
+    return result
+
+def read_line(index, line_id):
+    file_id = int(index["line_files"][line_id])
+    data = index["maps"].get(file_id)
+    if data is None:
+        with open(index["files"][file_id], 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index["maps"][file_id] = data
+    start = int(index["line_offsets"][line_id])
+    end = data.find(b'\n', start)
+    return data[start:end if end >= 0 else len(data)].decode('utf-8')
+
+def match_line(tokens, elements):
+    """
+    Start positions of the pattern in a list of (word, tag) tokens.
+    """
+    matches = []
+    for i in range(len(tokens) - len(elements) + 1):
+        if all((word is None or tokens[i + j][0] == word) and (tag is None or tokens[i + j][1] == tag)
+               for j, (word, tag) in enumerate(elements)):
+            matches.append(i)
+    return matches
+
+def concordance(index, pattern, page=0, page_size=PAGE_SIZE, width=5):
+    """
+    Keyword-in-context lines for a pattern.
+
+    Candidate lines come from the index and are read in corpus order; reading
+    stops as soon as the requested page is full.
+
+    Args:
+        index: Index returned by load_concordance
+        pattern: Pattern string (see parse_pattern)
+        page: Page number, starting at 0
+        page_size: Matches per page
+        width: Context words on each side
+    Returns:
+        List of (file, left context, match, right context) tuples
+    """
+    elements = parse_pattern(pattern)
+    if not elements:
+        return []
+    skip = page * page_size
+    result = []
+    for line_id in candidate_lines(index, elements):
+        line = read_line(index, int(line_id))
+        tokens = [tuple(token.split('/')[:2]) for token in line.split() if '/' in token]
+        for i in match_line(tokens, elements):
+            if skip > 0:
+                skip -= 1
+                continue
+            left = " ".join(word for word, _ in tokens[max(0, i - width):i])
+            match = " ".join(f"{word}/{tag}" for word, tag in tokens[i:i + len(elements)])
+            right = " ".join(word for word, _ in tokens[i + len(elements):i + len(elements) + width])
+            result.append((index["files"][int(index["line_files"][line_id])], left, match, right))
+            if len(result) == page_size:
+                return result
+    return result
+
+def print_concordance(lines):
+    for file_path, left, match, right in lines:
+        print(f"{os.path.basename(file_path)}\t{left:>40} [{match}] {right}")
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "build":
+        if len(sys.argv) != 4:
+            print("Usage: python concordance.py build <tagged_path> <index_directory>")
+            sys.exit(1)
+
+        input_path = sys.argv[2]
+        index_dir = sys.argv[3]
+
+        if not os.path.exists(input_path):
+            print("Error. Provided input path does not exist. Exiting.")
+            sys.exit(1)
+
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+
+        build_concordance(list_inputs(input_path), index_dir)
+        print(f"Concordance index written to: {index_dir}")
+
+    elif command == "query":
+        if len(sys.argv) < 4:
+            print("Usage: python concordance.py query <index_directory> <pattern> [page] [page_size] [width]")
+            sys.exit(1)
+
+        index = load_concordance(sys.argv[2])
+        pattern = sys.argv[3]
+        page = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        page_size = int(sys.argv[5]) if len(sys.argv) > 5 else PAGE_SIZE
+        width = int(sys.argv[6]) if len(sys.argv) > 6 else 5
+
+        print_concordance(concordance(index, pattern, page, page_size, width))
+
+    elif command == "interactive":
+        if len(sys.argv) < 3:
+            print("Usage: python concordance.py interactive <index_directory> [page_size] [width]")
+            sys.exit(1)
+
+        index = load_concordance(sys.argv[2])
+        page_size = int(sys.argv[3]) if len(sys.argv) > 3 else PAGE_SIZE
+        width = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+
+        # an empty line shows the next page of the previous pattern
+        pattern, page = None, 0
+        while True:
+            try:
+                line = input("pattern> ").strip()
+            except EOFError:
+                break
+            if line:
+                pattern, page = line, 0
+            elif pattern is None:
+                continue
+            else:
+                page += 1
+            lines = concordance(index, pattern, page, page_size, width)
+            if not lines:
+                print("No more matches.")
+            print_concordance(lines)
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import sys
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from unigrams import read_unigrams, write_unigrams
+from bigrams import read_bigrams, write_bigrams
+from trigrams import read_trigrams, write_trigrams
+from batch import list_files
+
+MATRIX_FILE = "counts.npz"
+KEYS_FILE = "keys.txt"
+DOCS_FILE = "documents.txt"
+KIND_FILE = "kind.txt"
+
+readers = {
+    "unigrams": lambda path: {(word,): count for word, count in read_unigrams(path).items()},
+    "bigrams": read_bigrams,
+    "tritags": read_trigrams,
+}
+
+writers = {
+    "unigrams": lambda path, table, threshold: write_unigrams(path, {key[0]: count for key, count in table.items()}, threshold),
+    "bigrams": write_bigrams,
+    "tritags": write_trigrams,
+}
+
+def help():
+    print("Usage: python countstore.py <command>")
+    print("List of commands:")
+    print("  build <unigrams|bigrams|tritags> <input_directory> <store_directory>")
+    print("  query <store_directory> <key> [document ...]")
+    print("  merge <store_directory> <output_file> threshold [document ...]")
+
+def build_store(kind, input_dir, store_dir):
+    """
+    Build a document x n-gram count matrix from per-document count files.
+
+    Args:
+        kind: "unigrams", "bigrams" or "tritags"
+        input_dir: Directory with one count file per document
+        store_dir: Output directory
+    """
+    if kind not in readers:
+        raise ValueError(f"Unknown table kind: {kind}")
+
+    key_ids = {}
+    docs, indptr, indices, data = [], [0], [], []
+    for path in list_files(input_dir):
+        print(f"Adding document: {path}")
+        try:
+            table = readers[kind](path)
+        except Exception as e:
+            print(f"Error reading count file {path}: {e}")
+            continue
+        for key, count in table.items():
+            indices.append(key_ids.setdefault(key, len(key_ids)))
+            data.append(count)
+        docs.append(os.path.splitext(os.path.basename(path))[0])
+        indptr.append(len(indices))
+
+    # columns are renumbered so that they follow the sorted key order
+    keys = sorted(key_ids)
+    remap = np.empty(len(keys), dtype=np.int64)
+    remap[[key_ids[key] for key in keys]] = np.arange(len(keys))
+    matrix = sp.csr_matrix((np.array(data, dtype=np.int64), remap[np.array(indices, dtype=np.int64)], np.array(indptr)),
+                           shape=(len(docs), len(keys)))
+    sp.save_npz(os.path.join(store_dir, MATRIX_FILE), matrix.tocsc())
+
+    with open(os.path.join(store_dir, KEYS_FILE), 'w', encoding='utf-8') as out_f:
+        for key in keys:
+            out_f.write('\t'.join(key) + '\n')
+    with open(os.path.join(store_dir, DOCS_FILE), 'w', encoding='utf-8') as out_f:
+        for doc in docs:
+            out_f.write(f"{doc}\n")
+    with open(os.path.join(store_dir, KIND_FILE), 'w', encoding='utf-8') as out_f:
+        out_f.write(f"{kind}\n")
+
+def load_store(store_dir):
+    """
+    Open a store built by build_store.
+
+    Returns:
+        Dictionary with the kind, documents, keys, lookups and the CSC matrix
+    """
+    def read_lines(name):
+        with open(os.path.join(store_dir, name), 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f]
+
+    keys = [tuple(line.split('\t')) for line in read_lines(KEYS_FILE)]
+    docs = read_lines(DOCS_FILE)
+    return {
+        "kind": read_lines(KIND_FILE)[0],
+        "docs": docs,
+        "doc_ids": {doc: i for i, doc in enumerate(docs)},
+        "keys": keys,
+        "key_ids": {key: i for i, key in enumerate(keys)},
+        "matrix": sp.load_npz(os.path.join(store_dir, MATRIX_FILE)).tocsc(),
+    }
+
+def document_rows(store, docs=None):
+    if docs is None:
+        return None
+    return np.array([store["doc_ids"][doc] for doc in docs], dtype=np.int64)
+
+def columns(store, keys):
+    return np.array([store["key_ids"].get(tuple(key), -1) for key in keys], dtype=np.int64)
+
+def totals(store, keys=None, docs=None):
+    """
+    Total counts of the given keys (all keys if None) over a subset of
+    documents (all documents if None).
+    """
+    matrix = store["matrix"]
+    rows = document_rows(store, docs)
+    if rows is not None:
+        matrix = matrix[rows]
+    result = np.asarray(matrix.sum(axis=0)).ravel()
+    if keys is None:
+        return result
+    cols = columns(store, keys)
+    return np.where(cols >= 0, result[np.maximum(cols, 0)], 0)
+
+def document_counts(store, key):
+    """
+    Counts of one key in every document, as a dense array aligned with docs.
+    """
+    col = store["key_ids"].get(tuple(key))
+    if col is None:
+        return np.zeros(len(store["docs"]), dtype=np.int64)
+    return store["matrix"][:, col].toarray().ravel()
+
+def document_frequency(store, keys=None, docs=None):
+    """
+    Number of documents containing each key.
+    """
+    matrix = store["matrix"]
+    rows = document_rows(store, docs)
+    if rows is not None:
+        matrix = matrix[rows].tocsc()
+    result = np.diff(matrix.indptr) if rows is None else np.asarray((matrix > 0).sum(axis=0)).ravel()
+    if keys is None:
+        return result
+    cols = columns(store, keys)
+    return np.where(cols >= 0, result[np.maximum(cols, 0)], 0)
+
+def merge_store(store, output_file, threshold=0, docs=None):
+    """
+    Write the merged table of a store (or of a subset of its documents) in
+    the format of its kind, as merge-batch does.
+    """
+    counts = totals(store, docs=docs)
+    keep = np.flatnonzero(counts > 0)
+    table = {store["keys"][i]: int(counts[i]) for i in keep}
+    writers[store["kind"]](output_file, table, threshold)
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "build":
+        if len(sys.argv) != 5:
+            print("Usage: python countstore.py build <unigrams|bigrams|tritags> <input_directory> <store_directory>")
+            sys.exit(1)
+
+        kind = sys.argv[2]
+        input_dir = sys.argv[3]
+        store_dir = sys.argv[4]
+
+        if not os.path.isdir(input_dir):
+            print("Error. Provided input directory does not exist. Exiting.")
+            sys.exit(1)
+
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+
+        build_store(kind, input_dir, store_dir)
+        print(f"Count store written to: {store_dir}")
+
+    elif command == "query":
+        if len(sys.argv) < 4:
+            print("Usage: python countstore.py query <store_directory> <key> [document ...]")
+            sys.exit(1)
+
+        store = load_store(sys.argv[2])
+        key = tuple(sys.argv[3].split())
+        docs = sys.argv[4:] or None
+
+        print(f"Total\t{totals(store, [key], docs)[0]}")
+        print(f"Documents\t{document_frequency(store, [key], docs)[0]}")
+        counts = document_counts(store, key)
+        for doc, count in zip(store["docs"], counts):
+            if count > 0 and (docs is None or doc in docs):
+                print(f"{doc}\t{count}")
+
+    elif command == "merge":
+        if len(sys.argv) < 5:
+            print("Usage: python countstore.py merge <store_directory> <output_file> threshold [document ...]")
+            sys.exit(1)
+
+        store = load_store(sys.argv[2])
+        output_file = sys.argv[3]
+        threshold = int(sys.argv[4])
+        docs = sys.argv[5:] or None
+
+        merge_store(store, output_file, threshold, docs)
+        print(f"Merged counts written to: {output_file}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import sys
+import os
+
+import numpy as np
+
+from tokenizer import tokens
+from batch import list_files, atomic_write, KEEP, SKIP
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 128
+BANDS = 16
+THRESHOLD = 0.8
+BLOCK_ROWS = 4096
+SEED = 0
+
+def help():
+    print("Usage: python dedup.py <command>")
+    print("List of commands:")
+    print("  find <input_directory> <skip_list_file> [threshold] [shingle_size]")
+    print("  compare <input_file1> <input_file2> [shingle_size]")
+
+def mix(x):
+    """
+    64-bit finaliser of MurmurHash3: a bijection that scrambles every bit.
+    """
+    x = x ^ (x >> np.uint64(33))
+    x = x * np.uint64(0xFF51AFD7ED558CCD)
+    x = x ^ (x >> np.uint64(33))
+    x = x * np.uint64(0xC4CEB9FE1A85EC53)
+    return x ^ (x >> np.uint64(33))
+
+def hash_family(num_hashes=NUM_HASHES, seed=SEED):
+    """
+    Multipliers (odd) and increments of the MinHash functions a * x + b modulo
+    2**64, which permute the already mixed shingle hashes.
+    """
+    values = np.random.default_rng(seed).integers(0, np.iinfo(np.uint64).max, (2, num_hashes),
+                                                  dtype=np.uint64, endpoint=True)
+    return values[0] | np.uint64(1), values[1]
+
+def token_ids(file_path, vocab):
+    """
+    Ids of the token stream of a file, as written by preprocess.py.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return np.fromiter((vocab.setdefault(token, len(vocab)) for line in f for token in tokens(line)),
+                           dtype=np.uint64)
+
+def shingles(ids, size=SHINGLE_SIZE):
+    """
+    Distinct hashes of the runs of size consecutive tokens. A text shorter
+    than size is one shingle.
+    """
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.uint64)
+    size = min(size, len(ids))
+    hashes = np.zeros(len(ids) - size + 1, dtype=np.uint64)
+    for j in range(size):
+        hashes = mix(hashes + ids[j:len(ids) - size + 1 + j])
+    return np.unique(hashes)
+
+def minhash(shingle_hashes, family):
+    """
+    MinHash signature: for every hash function of the family, the minimum
+    over the shingles, computed in blocks of shingles.
+    """
+    multipliers, increments = family
+    signature = np.full(len(multipliers), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingle_hashes), BLOCK_ROWS):
+        block = shingle_hashes[start:start + BLOCK_ROWS, None] * multipliers
+        block += increments
+        np.minimum(signature, block.min(axis=0), out=signature)
+    return signature
+
+def band_keys(signatures, bands=BANDS):
+    """
+    One hash per band of rows of every signature (documents x bands).
+    """
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for j in range(rows):
+        keys = mix(keys + signatures[:, j::rows][:, :bands])
+    return keys
+
+def similarity(signature1, signature2):
+    """
+    Jaccard similarity estimated from two signatures.
+    """
+    return float(np.mean(signature1 == signature2))
+
+def find_duplicates(paths, threshold=THRESHOLD, shingle_size=SHINGLE_SIZE):
+    """
+    Find near-duplicate files with MinHash signatures and LSH banding.
+
+    Files are visited from the largest (most shingles) to the smallest. A file
+    whose signature shares a band with a kept file and whose estimated
+    similarity to it reaches threshold is a duplicate; otherwise it is kept.
+    Files without tokens are always kept.
+
+    Args:
+        paths: Input files
+        threshold: Minimum estimated Jaccard similarity of duplicates
+        shingle_size: Number of tokens per shingle
+    Returns:
+        Dictionary path -> (KEEP, None, None) or (SKIP, kept path, similarity)
+    """
+    family = hash_family()
+    vocab = {}
+    signatures = np.empty((len(paths), NUM_HASHES), dtype=np.uint64)
+    sizes = []
+    for i, path in enumerate(paths):
+        print(f"Computing signature of: {path}")
+        shingle_hashes = shingles(token_ids(path, vocab), shingle_size)
+        signatures[i] = minhash(shingle_hashes, family)
+        sizes.append(len(shingle_hashes))
+
+    keys = band_keys(signatures).tolist()
+    buckets = [{} for _ in range(BANDS)]
+    result = {}
+    for i in sorted(range(len(paths)), key=lambda i: (-sizes[i], paths[i])):
+        if sizes[i] == 0:
+            result[paths[i]] = (KEEP, None, None)
+            continue
+        candidates = sorted({j for band, key in enumerate(keys[i]) for j in buckets[band].get(key, [])})
+        scores = [(similarity(signatures[i], signatures[j]), j) for j in candidates]
+        score, best = max(scores, key=lambda entry: entry[0], default=(0.0, None))
+        if best is not None and score >= threshold:
+            result[paths[i]] = (SKIP, paths[best], score)
+            continue
+        result[paths[i]] = (KEEP, None, None)
+        for band, key in enumerate(keys[i]):
+            buckets[band].setdefault(key, []).append(i)
+    return result
+
+def write_skip_list(file_path, result):
+    """
+    Write one line per input: name<TAB>keep or
+    name<TAB>skip<TAB>kept name<TAB>similarity.
+    """
+    with atomic_write(file_path) as out_f:
+        for path in sorted(result):
+            status, original, score = result[path]
+            if status == KEEP:
+                out_f.write(f"{os.path.basename(path)}\t{KEEP}\n")
+            else:
+                out_f.write(f"{os.path.basename(path)}\t{SKIP}\t{os.path.basename(original)}\t{score:.3f}\n")
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "find":
+        if len(sys.argv) < 4:
+            print("Usage: python dedup.py find <input_directory> <skip_list_file> [threshold] [shingle_size]")
+            sys.exit(1)
+
+        input_directory = sys.argv[2]
+        skip_list_file = sys.argv[3]
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else THRESHOLD
+        shingle_size = int(sys.argv[5]) if len(sys.argv) > 5 else SHINGLE_SIZE
+
+        if not os.path.isdir(input_directory):
+            print("Error. Provided input directory does not exist. Exiting.")
+            sys.exit(1)
+
+        result = find_duplicates(list_files(input_directory), threshold, shingle_size)
+        write_skip_list(skip_list_file, result)
+        skipped = sum(1 for status, _, _ in result.values() if status == SKIP)
+        print(f"{skipped} of {len(result)} files are duplicates. Skip list written to: {skip_list_file}")
+
+    elif command == "compare":
+        if len(sys.argv) < 4:
+            print("Usage: python dedup.py compare <input_file1> <input_file2> [shingle_size]")
+            sys.exit(1)
+
+        shingle_size = int(sys.argv[4]) if len(sys.argv) > 4 else SHINGLE_SIZE
+        vocab = {}
+        shingles1 = shingles(token_ids(sys.argv[2], vocab), shingle_size)
+        shingles2 = shingles(token_ids(sys.argv[3], vocab), shingle_size)
+        family = hash_family()
+        exact = len(np.intersect1d(shingles1, shingles2)) / max(len(np.union1d(shingles1, shingles2)), 1)
+        print(f"Estimated similarity: {similarity(minhash(shingles1, family), minhash(shingles2, family)):.3f}")
+        print(f"Exact similarity: {exact:.3f}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import sys
+import importlib
+
+from querycache import keep_loaded_tables
+
+# Separates chained commands, so it cannot be used as an argument value.
+CHAIN_SEPARATOR = "then"
+
+# Modules are imported only when one of their commands runs, so light
+# commands do not pay for NumPy or SciPy.
+MODULES = {
+    "unigrams": "unigrams",
+    "bigrams": "bigrams",
+    "trigrams": "trigrams",
+    "preprocess": "preprocess",
+    "tagger": "tagger",
+    "tokenizer": "tokenizer",
+    "ngrams": "ngrams",
+    "index": "index",
+    "suffixarray": "suffixarray",
+    "concordance": "concordance",
+    "countstore": "countstore",
+    "sharedtables": "sharedtables",
+    "collocations": "collocations",
+    "langmodel": "langmodel",
+    "wordvectors": "wordvectors",
+    "lexicon": "lexicon",
+    "querycache": "querycache",
+    "nounfinder": "ml.nounfinder",
+    "dedup": "dedup",
+}
+
+def help():
+    print("Usage: python diccionarios.py <module> <command> [args ...] [then <module> <command> [args ...] ...]")
+    print("List of modules:")
+    for name in MODULES:
+        print(f"  {name}")
+    print("Run python diccionarios.py <module> to list the commands of a module.")
+    print(f"\"{CHAIN_SEPARATOR}\" is reserved for chaining and cannot be used as an argument value.")
+
+def split_chain(args):
+    """
+    Split a command line into the commands chained with "then".
+
+    Returns:
+        List of argument lists, one per command
+    """
+    chain = [[]]
+    for arg in args:
+        if arg == CHAIN_SEPARATOR:
+            chain.append([])
+        else:
+            chain[-1].append(arg)
+    return chain
+
+def run_command(args):
+    """
+    Run one module command in this process, as if its script had been
+    called with args.
+
+    Returns:
+        Exit code of the command
+    """
+    name = args[0]
+    module = importlib.import_module(MODULES[name])
+    sys.argv = [f"{name}.py"] + args[1:]
+    try:
+        module.main()
+    except SystemExit as e:
+        return e.code or 0
+    return 0
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    chain = split_chain(sys.argv[1:])
+    for args in chain:
+        if not args:
+            print("Error. Empty command in chain. Exiting.")
+            sys.exit(1)
+        if args[0] not in MODULES:
+            print(f"Unknown module: {args[0]}")
+            help()
+            sys.exit(1)
+
+    for i, args in enumerate(chain):
+        # Only files named by a later command are worth keeping in memory.
+        keep_loaded_tables([arg for later in chain[i + 1:] for arg in later[1:]])
+        code = run_command(args)
+        if code:
+            sys.exit(code)
+
+if __name__ == "__main__":
+    main()
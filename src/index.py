@@ -0,0 +1,280 @@
+import sys
+import os
+from array import array
+
+import numpy as np
+
+WORD_VOCAB = "words.vocab"
+TAG_VOCAB = "tags.vocab"
+
+def help():
+    print("Usage: python index.py <command>")
+    print("List of commands:")
+    print("  build <tagged_file> <index_directory>")
+    print("  search-words-by-pattern <index_directory> <tag1> <tag3> threshold")
+    print("  search-realtions-by-pattern <index_directory>")
+
+def get_id(vocab, ids, key):
+    try:
+        return ids[key]
+    except KeyError:
+        ids[key] = len(vocab)
+        vocab.append(key)
+        return ids[key]
+
+def read_tagged_tokens(file_path):
+    """
+    Read a tagged file and map every token to a word id and a tag id.
+
+    A gap position (id -1) is inserted after every line so that patterns
+    never match across line boundaries.
+
+    Args:
+        file_path: Path to the tagged file
+    Returns:
+        Tuple (words, tags, word_ids, tag_ids) with the word and tag
+        vocabularies and the per-position word and tag id arrays
+    """
+    words, tags = [], []
+    word_index, tag_index = {}, {}
+    word_ids, tag_ids = array('i'), array('i')
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            for token in line.strip().split():
+                parts = token.split('/')
+                if len(parts) < 2:
+                    continue
+                word_ids.append(get_id(words, word_index, parts[0]))
+                tag_ids.append(get_id(tags, tag_index, parts[1]))
+            word_ids.append(-1)
+            tag_ids.append(-1)
+    return words, tags, np.frombuffer(word_ids, dtype=np.int32), np.frombuffer(tag_ids, dtype=np.int32)
+
+def group_by_key(keys, nkeys):
+    """
+    Group positions by key.
+
+    Args:
+        keys: Array with the key id of every position (-1 entries are skipped)
+        nkeys: Number of distinct keys
+    Returns:
+        Tuple (positions, offsets) where positions[offsets[k]:offsets[k + 1]]
+        are the sorted positions of key k
+    """
+    positions = np.argsort(keys, kind='stable')
+    positions = positions[keys[positions] >= 0]
+    offsets = np.zeros(nkeys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys[keys >= 0], minlength=nkeys), out=offsets[1:])
+    return positions, offsets
+
+def position_dtype(n):
+    return np.uint32 if n < 2**32 else np.int64
+
+def write_vocab(file_path, vocab):
+    with open(file_path, 'w', encoding='utf-8') as out_f:
+        for key in vocab:
+            out_f.write(f"{key}\n")
+
+def read_vocab(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+def build_index(tagged_file, index_dir):
+    """
+    Build a positional inverted index over a tagged file.
+
+    Args:
+        tagged_file: Path to the (merged) tagged file
+        index_dir: Directory where the index arrays are written
+    """
+    words, tags, word_ids, tag_ids = read_tagged_tokens(tagged_file)
+    np.save(os.path.join(index_dir, "tokens.npy"), word_ids)
+    np.save(os.path.join(index_dir, "tags.npy"), tag_ids)
+    for name, vocab, ids in (("word", words, word_ids), ("tag", tags, tag_ids)):
+        positions, offsets = group_by_key(ids, len(vocab))
+        np.save(os.path.join(index_dir, f"{name}_postings.npy"), positions.astype(position_dtype(len(ids))))
+        np.save(os.path.join(index_dir, f"{name}_offsets.npy"), offsets)
+    write_vocab(os.path.join(index_dir, WORD_VOCAB), words)
+    write_vocab(os.path.join(index_dir, TAG_VOCAB), tags)
+
+def load_index(index_dir):
+    """
+    Open an index built by build_index. Arrays are memory-mapped.
+
+    Args:
+        index_dir: Index directory
+    Returns:
+        Dictionary with the vocabularies, the id lookups and the index arrays
+    """
+    index = {}
+    for name, vocab_file in (("word", WORD_VOCAB), ("tag", TAG_VOCAB)):
+        vocab = read_vocab(os.path.join(index_dir, vocab_file))
+        index[f"{name}s"] = vocab
+        index[f"{name}_ids"] = {key: i for i, key in enumerate(vocab)}
+        index[f"{name}_postings"] = np.load(os.path.join(index_dir, f"{name}_postings.npy"), mmap_mode='r')
+        index[f"{name}_offsets"] = np.load(os.path.join(index_dir, f"{name}_offsets.npy"), mmap_mode='r')
+    index["tokens"] = np.load(os.path.join(index_dir, "tokens.npy"), mmap_mode='r')
+    index["tags"] = np.load(os.path.join(index_dir, "tags.npy"), mmap_mode='r')
+    return index
+
+def postings(index, field, key):
+    """
+    Return the sorted positions of a word (field "word") or a tag (field "tag").
+    The result is a view on the memory-mapped posting array.
+    """
+    key_id = index[f"{field}_ids"].get(key)
+    if key_id is None:
+        return np.empty(0, dtype=np.int64)
+    offsets = index[f"{field}_offsets"]
+    return index[f"{field}_postings"][offsets[key_id]:offsets[key_id + 1]]
+
+def contains(sorted_values, values):
+    """
+    Return a mask telling which values are present in sorted_values.
+
+    Values outside the range of sorted_values are absent; the others are cast
+    to its dtype, so the binary search runs on the (memory-mapped) array
+    instead of an upcast copy of it.
+    """
+    mask = np.zeros(len(values), dtype=bool)
+    if len(sorted_values) == 0:
+        return mask
+    inside = (values >= sorted_values[0]) & (values <= sorted_values[-1])
+    probes = values[inside].astype(sorted_values.dtype)
+    mask[inside] = sorted_values[np.searchsorted(sorted_values, probes)] == probes
+    return mask
+
+def match_positions(index, terms):
+    """
+    Find the start positions of a sequence of terms.
+
+    The shortest posting list gives the candidates; the longer ones are only
+    probed with binary searches, so frequent tags are never scanned.
+
+    Args:
+        index: Index returned by load_index
+        terms: List of (field, key) tuples, or None as a single-token wildcard
+    Returns:
+        Sorted array with the positions of the first term of every match
+    """
+    lists = [(offset, postings(index, term[0], term[1])) for offset, term in enumerate(terms) if term is not None]
+    tokens = index["tokens"]
+    if not lists:
+        return np.flatnonzero(np.asarray(tokens) >= 0)
+    lists.sort(key=lambda entry: len(entry[1]))
+    offset, shortest = lists[0]
+    result = np.asarray(shortest, dtype=np.int64) - offset
+    result = result[(result >= 0) & (result <= len(tokens) - len(terms))]
+    for offset, positions in lists[1:]:
+        if len(result) == 0:
+            break
+        result = result[contains(positions, result + offset)]
+    for offset, term in enumerate(terms):
+        if term is None:
+            # wildcards must still land on a token, not on a line gap
+            result = result[tokens[result + offset] >= 0]
+    return result
+
+def count_words(index, positions):
+    """
+    Count the words found at the given positions.
+    """
+    ids, counts = np.unique(np.asarray(index["tokens"][positions]), return_counts=True)
+    words = index["words"]
+    return {words[i]: int(c) for i, c in zip(ids, counts)}
+
+def find_words_from_pattern(index, start_tag, end_tag):
+    """
+    Indexed equivalent of trigrams.find_words_from_pattern.
+
+    Args:
+        index: Index returned by load_index
+        start_tag: The starting tag
+        end_tag: The ending tag
+    Returns:
+        Dictionary with the UNK words found between both tags and their counts
+    """
+    positions = match_positions(index, [("tag", start_tag), ("tag", "UNK"), ("tag", end_tag)])
+    return count_words(index, positions + 1)
+
+def find_relations_from_pattern(index, pattern):
+    """
+    Indexed equivalent of trigrams.find_relations_from_pattern.
+
+    Args:
+        index: Index returned by load_index
+        pattern: List with three tags
+    Returns:
+        Dictionary with (first word, last word) relations and their counts
+    """
+    positions = match_positions(index, [("tag", tag) for tag in pattern])
+    tokens = index["tokens"]
+    pairs = np.stack([tokens[positions], tokens[positions + 2]], axis=1) if len(positions) else np.empty((0, 2), dtype=np.int32)
+    pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+    words = index["words"]
+    return {(words[a], words[b]): int(c) for (a, b), c in zip(pairs, counts)}
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "build":
+        if len(sys.argv) != 4:
+            print("Usage: python index.py build <tagged_file> <index_directory>")
+            sys.exit(1)
+
+        tagged_file = sys.argv[2]
+        index_dir = sys.argv[3]
+
+        if not os.path.isfile(tagged_file):
+            print("Error. Provided tagged file does not exist. Exiting.")
+            sys.exit(1)
+
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+
+        print(f"Indexing tagged file: {tagged_file}")
+        build_index(tagged_file, index_dir)
+        print(f"Index written to: {index_dir}")
+
+    elif command == "search-words-by-pattern":
+        if len(sys.argv) < 6:
+            print("Usage: python index.py search-words-by-pattern <index_directory> <tag1> <tag3> threshold")
+            sys.exit(1)
+
+        index = load_index(sys.argv[2])
+        tag1 = sys.argv[3]
+        tag3 = sys.argv[4]
+        threshold = int(sys.argv[5])
+        result = find_words_from_pattern(index, tag1, tag3)
+        for word, count in result.items():
+            if count >= threshold:
+                print(f"{word}")
+
+    elif command == "search-realtions-by-pattern":
+        if len(sys.argv) < 3:
+            print("Usage: python index.py search-realtions-by-pattern <index_directory>")
+            sys.exit(1)
+
+        index = load_index(sys.argv[2])
+
+        nouns = ["NMS", "NFS", "NMP", "NFP"]
+        for n in nouns:
+            for m in nouns:
+                pattern = [n, "DE", m]
+                print(f"Searching pattern: {pattern}")
+                result = find_relations_from_pattern(index, pattern)
+                for word, count in result.items():
+                    print(f"{word}\t{count}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import sys
+
+import numpy as np
+
+from tokenizer import words
+from unigrams import read_unigrams
+from bigrams import bigram_id_chunks
+
+KNESER_NEY = "kneser-ney"
+STUPID_BACKOFF = "stupid-backoff"
+
+def help():
+    print("Usage: python langmodel.py <command>")
+    print("List of commands:")
+    print("  score <unigrams_file> <bigrams_file> <sentences_file> [kneser-ney|stupid-backoff]")
+    print("  rank <unigrams_file> <bigrams_file> <sentences_file> [kneser-ney|stupid-backoff]")
+
+def load_model(unigrams_file, bigrams_file, method=KNESER_NEY, discount=0.75, alpha=0.4):
+    """
+    Build a smoothed bigram language model from merged count tables.
+
+    All smoothing terms are precomputed into arrays indexed by word id, so
+    scoring only needs array lookups.
+
+    Args:
+        unigrams_file: Merged .unigrams file
+        bigrams_file: Merged .bigrams file
+        method: "kneser-ney" (interpolated, absolute discounting) or
+            "stupid-backoff"
+        discount: Kneser-Ney discount D
+        alpha: Stupid backoff factor
+    Returns:
+        Dictionary with the vocabulary and the model arrays
+    """
+    if method not in (KNESER_NEY, STUPID_BACKOFF):
+        raise ValueError(f"Unknown smoothing method: {method}")
+
+    unigrams = read_unigrams(unigrams_file)
+    vocab = sorted(unigrams)
+    ids = {word: i for i, word in enumerate(vocab)}
+    size = len(vocab)
+    unigram_counts = np.array([unigrams[word] for word in vocab], dtype=np.float64)
+    total = unigram_counts.sum()
+
+    chunks = list(bigram_id_chunks(bigrams_file, ids))
+    first = np.concatenate([c[0] for c in chunks]) if chunks else np.empty(0, dtype=np.int64)
+    second = np.concatenate([c[1] for c in chunks]) if chunks else np.empty(0, dtype=np.int64)
+    counts = np.concatenate([c[2] for c in chunks]).astype(np.float64) if chunks else np.empty(0)
+    keys = first * size + second
+    order = np.argsort(keys)
+
+    model = {
+        "method": method,
+        "vocab": vocab,
+        "ids": ids,
+        "size": size,
+        "keys": keys[order],
+        "counts": counts[order],
+        "history": np.bincount(first, weights=counts, minlength=size),
+        "unigram": np.log10(unigram_counts / total) if size else np.empty(0),
+        "oov": np.log10(1.0 / (total + size + 1)),
+    }
+    if method == KNESER_NEY:
+        followers = np.bincount(first, minlength=size)
+        continuation = np.bincount(second, minlength=size)
+        # add-one on the continuation counts keeps words never seen in second
+        # position from getting zero probability
+        model["continuation"] = (continuation + 1.0) / (len(keys) + size)
+        history = model["history"]
+        model["backoff"] = np.where(history > 0, discount * followers / np.maximum(history, 1), 1.0)
+        model["discount"] = discount
+    else:
+        model["alpha"] = np.log10(alpha)
+    return model
+
+def tokenize(sentence):
+    return words(sentence)
+
+def bigram_counts(model, prev, curr):
+    """
+    Look up the counts of the (prev, curr) id pairs, 0 when unseen.
+    """
+    keys = model["keys"]
+    if len(keys) == 0:
+        return np.zeros(len(prev))
+    packed = prev * model["size"] + curr
+    i = np.minimum(np.searchsorted(keys, packed), len(keys) - 1)
+    return np.where(keys[i] == packed, model["counts"][i], 0.0)
+
+def transition_logprobs(model, prev, curr):
+    """
+    Vectorised log10 P(curr | prev) for arrays of known word ids.
+    """
+    counts = bigram_counts(model, prev, curr)
+    history = model["history"][prev]
+    seen = history > 0
+    if model["method"] == KNESER_NEY:
+        discounted = np.maximum(counts - model["discount"], 0) / np.where(seen, history, 1)
+        return np.log10(discounted + model["backoff"][prev] * model["continuation"][curr])
+    relative = np.log10(np.maximum(counts, 1) / np.where(seen, history, 1))
+    return np.where(counts > 0, relative, model["alpha"] + model["unigram"][curr])
+
+def score_sentences(model, sentences):
+    """
+    Score a batch of sentences.
+
+    Args:
+        model: Model returned by load_model
+        sentences: List of sentences (raw text)
+    Returns:
+        Tuple (log10 probabilities, number of tokens) as arrays aligned with
+        the input sentences
+    """
+    ids = model["ids"]
+    tokens = [[ids.get(word, -1) for word in tokenize(sentence)] for sentence in sentences]
+    lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+    flat = np.fromiter((i for t in tokens for i in t), dtype=np.int64, count=int(lengths.sum()))
+    owner = np.repeat(np.arange(len(sentences)), lengths)
+    starts = np.zeros(len(flat), dtype=bool)
+    starts[np.cumsum(lengths)[lengths > 0] - lengths[lengths > 0]] = True
+
+    logprobs = np.full(len(flat), model["oov"])
+    known = flat >= 0
+    first = starts & known
+    logprobs[first] = model["unigram"][flat[first]]
+
+    prev = np.concatenate(([-1], flat[:-1])) if len(flat) else flat
+    pairs = ~starts & known & (prev >= 0)
+    logprobs[pairs] = transition_logprobs(model, prev[pairs], flat[pairs])
+    # a known word after an unknown one falls back to its unigram probability
+    after_oov = ~starts & known & (prev < 0)
+    logprobs[after_oov] = model["unigram"][flat[after_oov]]
+
+    scores = np.bincount(owner, weights=logprobs, minlength=len(sentences))
+    return scores, lengths
+
+def read_sentences(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command in ("score", "rank"):
+        if len(sys.argv) < 5:
+            print(f"Usage: python langmodel.py {command} <unigrams_file> <bigrams_file> <sentences_file> [kneser-ney|stupid-backoff]")
+            sys.exit(1)
+
+        unigrams_file = sys.argv[2]
+        bigrams_file = sys.argv[3]
+        sentences_file = sys.argv[4]
+        method = sys.argv[5] if len(sys.argv) > 5 else KNESER_NEY
+
+        model = load_model(unigrams_file, bigrams_file, method)
+        sentences = read_sentences(sentences_file)
+        scores, lengths = score_sentences(model, sentences)
+        per_token = scores / np.maximum(lengths, 1)
+
+        order = np.argsort(-per_token, kind='stable') if command == "rank" else range(len(sentences))
+        for i in order:
+            print(f"{scores[i]:.4f}\t{per_token[i]:.4f}\t{sentences[i]}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
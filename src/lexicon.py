@@ -0,0 +1,168 @@
+import sys
+
+import numpy as np
+
+from preprocess import stopwords
+from bigrams import read_tagged
+from wordvectors import select_vocabulary, matrix_from_bigrams, ppmi, word_vectors, normalize, nearest_neighbours, BOTH
+
+def help():
+    print("Usage: python lexicon.py <command>")
+    print("List of commands:")
+    print("  expand <dtag_file> <unigrams_file> <bigrams_file> <output_file> <min_count> <top_n> [dim] [brute|ivf]")
+
+def build_ivf(vectors, nlists, iterations=10, seed=0):
+    """
+    Build an IVF (inverted file) index: spherical k-means partitions of the
+    normalised vectors.
+
+    Args:
+        vectors: Normalised vectors (n, dim)
+        nlists: Number of partitions
+        iterations: k-means iterations
+    Returns:
+        Dictionary with the partition centroids and, per partition, the
+        indices of its vectors
+    """
+    rng = np.random.default_rng(seed)
+    nlists = max(1, min(nlists, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), nlists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+    assignment = np.argmax(vectors @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind='stable')
+    bounds = np.searchsorted(assignment[order], np.arange(nlists + 1))
+    return {
+        "vectors": vectors,
+        "centroids": centroids,
+        "lists": [order[bounds[i]:bounds[i + 1]] for i in range(nlists)],
+    }
+
+def ivf_search(index, queries, k=10, nprobe=8):
+    """
+    Approximate cosine nearest neighbours: only the nprobe partitions closest
+    to each query are scanned.
+
+    Returns:
+        Tuple (indices, similarities) per query, best first
+    """
+    queries = normalize(np.asarray(queries, dtype=np.float32))
+    probes = np.argsort(-(queries @ index["centroids"].T), axis=1)[:, :nprobe]
+    result_idx, result_sim = [], []
+    for query, lists in zip(queries, probes):
+        candidates = np.concatenate([index["lists"][i] for i in lists])
+        sims = index["vectors"][candidates] @ query
+        top = np.argsort(-sims, kind='stable')[:k]
+        result_idx.append(candidates[top])
+        result_sim.append(sims[top])
+    return result_idx, result_sim
+
+def class_centroids(vectors, vocab, classes):
+    """
+    Normalised centroid of the seed words of every class.
+
+    Returns:
+        Tuple (class names, centroid array, set of seed row indices)
+    """
+    ids = {word: i for i, word in enumerate(vocab)}
+    names, centroids, seeds = [], [], set()
+    for name, words in classes.items():
+        rows = [ids[word] for word in words if word in ids]
+        if not rows:
+            print(f"No seed of class {name} in the vocabulary. Skipping.")
+            continue
+        seeds.update(rows)
+        names.append(name)
+        centroids.append(vectors[rows].mean(axis=0))
+    if not centroids:
+        return names, np.empty((0, vectors.shape[1]), dtype=np.float32), seeds
+    return names, normalize(np.array(centroids, dtype=np.float32)), seeds
+
+def expand_lexicon(vectors, vocab, classes, top_n, method="brute", nlists=None, nprobe=8):
+    """
+    Rank candidate words for every class of a lexicon by similarity to the
+    centroid of its seed words.
+
+    Seeds of any class and stopwords are never proposed.
+
+    Args:
+        vectors: Word vectors (rows aligned with vocab)
+        vocab: Vocabulary
+        classes: Dictionary class -> seed words (as returned by read_tagged)
+        top_n: Number of candidates per class
+        method: "brute" (exact, blocked) or "ivf" (partitioned, approximate)
+    Returns:
+        Dictionary class -> list of (word, similarity)
+    """
+    vectors = normalize(np.asarray(vectors, dtype=np.float32))
+    names, centroids, seeds = class_centroids(vectors, vocab, classes)
+    if not names:
+        return {}
+    excluded = seeds | {i for i, word in enumerate(vocab) if word in stopwords}
+    k = top_n + len(excluded)
+    if method == "ivf":
+        index = build_ivf(vectors, nlists or int(np.sqrt(len(vectors))))
+        indices, similarities = ivf_search(index, centroids, k, nprobe)
+    else:
+        indices, similarities = nearest_neighbours(vectors, centroids, k)
+
+    result = {}
+    for name, idx, sims in zip(names, indices, similarities):
+        candidates = [(vocab[i], float(s)) for i, s in zip(idx, sims) if i not in excluded]
+        result[name] = candidates[:top_n]
+    return result
+
+def write_lexicon(file_path, lexicon):
+    with open(file_path, 'w', encoding='utf-8') as out_f:
+        for name, candidates in lexicon.items():
+            out_f.write(f"#{name}\n")
+            for word, _ in candidates:
+                out_f.write(f"{word}\n")
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "expand":
+        if len(sys.argv) < 8:
+            print("Usage: python lexicon.py expand <dtag_file> <unigrams_file> <bigrams_file> <output_file> <min_count> <top_n> [dim] [brute|ivf]")
+            sys.exit(1)
+
+        dtag_file = sys.argv[2]
+        unigrams_file = sys.argv[3]
+        bigrams_file = sys.argv[4]
+        output_file = sys.argv[5]
+        min_count = int(sys.argv[6])
+        top_n = int(sys.argv[7])
+        dim = int(sys.argv[8]) if len(sys.argv) > 8 else 100
+        method = sys.argv[9] if len(sys.argv) > 9 else "brute"
+
+        classes = {name: [w for w in words if w] for name, words in read_tagged(dtag_file).items()}
+        vocab, context_words = select_vocabulary(unigrams_file, min_count)
+        matrix = ppmi(matrix_from_bigrams(bigrams_file, vocab, context_words, BOTH))
+        vectors = word_vectors(matrix, min(dim, min(matrix.shape) - 1))
+
+        lexicon = expand_lexicon(vectors, vocab, classes, top_n, method)
+        for name, candidates in lexicon.items():
+            print(f"#{name}")
+            for word, similarity in candidates:
+                print(f"{word}\t{similarity:.4f}")
+        write_lexicon(output_file, lexicon)
+        print(f"Candidates written to: {output_file}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
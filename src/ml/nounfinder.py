@@ -0,0 +1,159 @@
+import sys
+import os
+import pickle
+
+import numpy as np
+import scipy.sparse as sp
+
+from preprocess import stopwords
+from bigrams import read_tagged
+from unigrams import iter_unigrams
+from wordvectors import matrix_from_bigrams, LEFT
+
+NOUN_CLASS = "N"
+CHUNK_SIZE = 65536
+
+def help():
+    print("Usage: python -m ml.nounfinder <command>")
+    print("List of commands:")
+    print("  train <bigrams_file> <dtag_file> <model_file> [epochs]")
+    print("  predict <model_file> <bigrams_file> <unigrams_file> <min_count> [threshold]")
+
+def feature_matrix(bigrams_file, words, context_words):
+    """
+    Left stopword-context features of many words at once: the bulk
+    equivalent of bigrams.make_noun_ft_array.
+
+    Args:
+        bigrams_file: Merged .bigrams file
+        words: Words (rows)
+        context_words: Stopwords (columns)
+    Returns:
+        CSR matrix with the relative frequency of every stopword before each word
+    """
+    matrix = matrix_from_bigrams(bigrams_file, words, context_words, LEFT)
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    return sp.diags(1 / np.where(totals > 0, totals, 1)) @ matrix
+
+def read_labels(dtag_file):
+    """
+    Words and labels (1 for the noun class, 0 otherwise) of a .dtag file.
+    """
+    words, labels = [], []
+    for name, class_words in read_tagged(dtag_file).items():
+        for word in class_words:
+            if word:
+                words.append(word)
+                labels.append(1.0 if name == NOUN_CLASS else 0.0)
+    return words, np.array(labels)
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+def train_sgd(features, labels, epochs=200, batch_size=256, learning_rate=1.0, l2=1e-4, seed=0):
+    """
+    Logistic regression trained by minibatch SGD on sparse rows.
+
+    Only one minibatch of rows is densified at a time, so the labelled set
+    may be as large as the feature matrix.
+
+    Returns:
+        Tuple (weights, bias)
+    """
+    rng = np.random.default_rng(seed)
+    n, dim = features.shape
+    weights, bias = np.zeros(dim), 0.0
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            rows = order[start:start + batch_size]
+            batch = features[rows]
+            error = sigmoid(batch @ weights + bias) - labels[rows]
+            rate = learning_rate / np.sqrt(1 + step)
+            weights -= rate * (batch.T @ error / len(rows) + l2 * weights)
+            bias -= rate * error.mean()
+            step += 1
+    return weights, bias
+
+def predict_proba(model, features, chunk_size=CHUNK_SIZE):
+    """
+    Noun probability of every row, scored in chunks of rows.
+    """
+    result = np.empty(features.shape[0])
+    for start in range(0, features.shape[0], chunk_size):
+        result[start:start + chunk_size] = sigmoid(features[start:start + chunk_size] @ model["weights"] + model["bias"])
+    return result
+
+def train(bigrams_file, dtag_file, epochs=200):
+    words, labels = read_labels(dtag_file)
+    context_words = list(dict.fromkeys(stopwords))
+    weights, bias = train_sgd(feature_matrix(bigrams_file, words, context_words), labels, epochs)
+    return {"context_words": context_words, "weights": weights, "bias": bias}
+
+def predict(model, bigrams_file, unigrams_file, min_count):
+    """
+    Score the vocabulary of a unigrams file.
+
+    Returns:
+        List of (word, probability), most probable first
+    """
+    words = [word for word, _ in iter_unigrams(unigrams_file, min_count=min_count)
+             if word not in stopwords]
+    probabilities = predict_proba(model, feature_matrix(bigrams_file, words, model["context_words"]))
+    order = np.argsort(-probabilities, kind='stable')
+    return [(words[i], float(probabilities[i])) for i in order]
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "train":
+        if len(sys.argv) < 5:
+            print("Usage: python -m ml.nounfinder train <bigrams_file> <dtag_file> <model_file> [epochs]")
+            sys.exit(1)
+
+        bigrams_file = sys.argv[2]
+        dtag_file = sys.argv[3]
+        model_file = sys.argv[4]
+        epochs = int(sys.argv[5]) if len(sys.argv) > 5 else 200
+
+        model_dir = os.path.dirname(model_file)
+        if model_dir and not os.path.isdir(model_dir):
+            os.makedirs(model_dir)
+
+        model = train(bigrams_file, dtag_file, epochs)
+        with open(model_file, 'wb') as f:
+            pickle.dump(model, f)
+        print(f"Model written to: {model_file}")
+
+    elif command == "predict":
+        if len(sys.argv) < 6:
+            print("Usage: python -m ml.nounfinder predict <model_file> <bigrams_file> <unigrams_file> <min_count> [threshold]")
+            sys.exit(1)
+
+        model_file = sys.argv[2]
+        bigrams_file = sys.argv[3]
+        unigrams_file = sys.argv[4]
+        min_count = int(sys.argv[5])
+        threshold = float(sys.argv[6]) if len(sys.argv) > 6 else 0.5
+
+        with open(model_file, 'rb') as f:
+            model = pickle.load(f)
+
+        for word, probability in predict(model, bigrams_file, unigrams_file, min_count):
+            if probability < threshold:
+                break
+            print(f"{word}\t{probability:.4f}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
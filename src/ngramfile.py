@@ -0,0 +1,226 @@
+import os
+
+from batch import atomic_write
+
+FORMAT_VERSION = 2
+CHUNK_SIZE = 1 << 20
+
+def seek_lower_bound(f, target, parse_key, start=0):
+    """
+    Binary search a sorted line-oriented file.
+
+    Leaves the file positioned at the first line whose key is greater than
+    or equal to target, so that reading can continue from there.
+
+    Args:
+        f: File opened in binary mode
+        target: Key to search for
+        parse_key: Function that extracts the key from a raw line, or returns
+            None for a line without one (blank or malformed); such lines are
+            stepped over and the next line is probed instead
+        start: Offset of the first data line (skips headers)
+    """
+    lo = start
+    hi = os.fstat(f.fileno()).st_size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        if mid > start:
+            f.readline()
+        key = None
+        line = f.readline()
+        while line and key is None:
+            key = parse_key(line)
+            line = f.readline()
+        if key is not None and key < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    f.seek(lo)
+    if lo > start:
+        f.readline()
+
+def query_prefix(query):
+    """
+    Return the leading fixed elements of a wildcard query.
+
+    Ex.: ("la", "*", "de") -> ("la",)
+    """
+    prefix = []
+    for q in query:
+        if q == "*":
+            break
+        prefix.append(q)
+    return tuple(prefix)
+
+def matches_query(key, query):
+    for k, q in zip(key, query):
+        if q != "*" and k != q:
+            return False
+    return True
+
+def in_range(count, min_count=None, max_count=None):
+    if min_count is not None and count < min_count:
+        return False
+    if max_count is not None and count > max_count:
+        return False
+    return True
+
+def format_header(kind):
+    return f"#{kind}\tv{FORMAT_VERSION}\n"
+
+def read_header(f):
+    """
+    Read the format header of an n-gram table.
+
+    Files written before the versioned format have no header and are
+    reported as version 1.
+
+    Args:
+        f: File opened in binary or text mode, positioned at the start
+    Returns:
+        Tuple (version, offset of the first data line)
+    """
+    line = f.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if line.startswith('#'):
+        fields = line.strip()[1:].split('\t')
+        version = int(fields[1].lstrip('v'))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported {fields[0]} format version {version}")
+        return version, f.tell()
+    f.seek(0)
+    return 1, 0
+
+def parse_fields(line):
+    """
+    Parse a data line of the tab-separated format: key fields then count.
+    """
+    parts = line.rstrip('\n').split('\t')
+    if len(parts) < 2:
+        return None
+    return tuple(parts[:-1]), int(parts[-1])
+
+def line_parser(version, legacy_parse):
+    return parse_fields if version >= 2 else legacy_parse
+
+def iter_table(file_path, legacy_parse, query=None, min_count=None, max_count=None, predicate=None, prefix=None):
+    """
+    Stream the entries of an n-gram table that pass the given filters.
+
+    Args:
+        file_path: Path to the table
+        legacy_parse: Line parser for files without format header
+        query: Optional key pattern, "*" matches any element. Leading fixed
+            elements are located with a binary search over the sorted file.
+        min_count: Minimum count (inclusive)
+        max_count: Maximum count (inclusive)
+        predicate: Optional function key -> bool
+        prefix: Explicit key prefix to jump to; defaults to the leading fixed
+            elements of query
+    Yields:
+        (key, count) tuples in file order
+    """
+    if prefix is None:
+        prefix = query_prefix(query) if query is not None else ()
+    with open(file_path, 'rb') as f:
+        version, start = read_header(f)
+        parse = line_parser(version, legacy_parse)
+        if prefix:
+            seek_lower_bound(f, prefix, lambda line: (parse(line.decode('utf-8')) or (None,))[0], start)
+        for line in f:
+            line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            entry = parse(line)
+            if entry is None:
+                continue
+            key, count = entry
+            if prefix and key[:len(prefix)] != prefix:
+                break
+            if not in_range(count, min_count, max_count):
+                continue
+            if query is not None and not matches_query(key, query):
+                continue
+            if predicate is not None and not predicate(key):
+                continue
+            yield key, count
+
+def read_table(file_path, legacy_parse):
+    """
+    Read a whole n-gram table into a dictionary.
+
+    Args:
+        file_path: Path to the table
+        legacy_parse: Line parser for files without format header; returns
+            None for lines that should be skipped
+    Returns:
+        Dictionary with key tuples as keys and counts as values
+    """
+    table = {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        version, _ = read_header(f)
+        if version >= 2:
+            for line in f:
+                parts = line.split('\t')
+                if len(parts) == 3:
+                    table[(parts[0], parts[1])] = int(parts[2])
+                elif len(parts) > 1:
+                    table[tuple(parts[:-1])] = int(parts[-1])
+        else:
+            for line in f:
+                entry = legacy_parse(line)
+                if entry is not None:
+                    table[entry[0]] = entry[1]
+    return table
+
+def read_table_chunks(file_path, legacy_parse, chunk_size=CHUNK_SIZE):
+    """
+    Read an n-gram table in chunks of roughly chunk_size bytes.
+
+    Yields:
+        Lists of (key, count) tuples
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        version, _ = read_header(f)
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            chunk = []
+            if version >= 2:
+                for line in lines:
+                    parts = line.split('\t')
+                    if len(parts) > 1:
+                        chunk.append((tuple(parts[:-1]), int(parts[-1])))
+            else:
+                for line in lines:
+                    entry = legacy_parse(line)
+                    if entry is not None:
+                        chunk.append(entry)
+            yield chunk
+
+def write_table(file_path, kind, table, threshold=0):
+    write_entries(file_path, kind, sorted(table.items()), threshold)
+
+def write_entries(file_path, kind, entries, threshold=0):
+    """
+    Write sorted (key, count) entries; the file is replaced atomically.
+    """
+    with atomic_write(file_path) as out_f:
+        out_f.write(format_header(kind))
+        for key, count in entries:
+            if count >= threshold:
+                out_f.write('\t'.join(key))
+                out_f.write(f"\t{count}\n")
+
+def migrate_table(input_path, output_path, kind, legacy_parse):
+    """
+    Rewrite an n-gram table in the current format. The input may be in any
+    supported version; input_path and output_path may be the same file.
+    """
+    with atomic_write(output_path) as out_f:
+        out_f.write(format_header(kind))
+        for chunk in read_table_chunks(input_path, legacy_parse):
+            out_f.write(''.join('\t'.join(key) + f"\t{count}\n" for key, count in chunk))
@@ -0,0 +1,222 @@
+import sys
+import os
+
+import numpy as np
+
+from tokenizer import iter_phrase_chunks, PHRASE_BREAK, CHUNK_SIZE
+from ngramfile import read_table, write_table
+from batch import list_inputs
+
+WORDS = "words"
+TAGS = "tags"
+MERGE_ROWS = 1 << 22
+
+# Token that ends a unit; no word or tag can be equal to it
+SEPARATORS = {WORDS: PHRASE_BREAK, TAGS: " "}
+
+def help():
+    print("Usage: python ngrams.py <command>")
+    print("List of commands:")
+    print("  count <words|tags> <input_path> <output_prefix> <pattern> [pattern ...]")
+    print("  Patterns use x for a counted position and _ for a skipped one: xx, xxxx, x_x, x__x")
+
+def parse_pattern(pattern):
+    """
+    Offsets of the counted positions of a pattern such as "xxx" or "x_x".
+    """
+    if not pattern or set(pattern) - {"x", "_"} or pattern[0] != "x" or pattern[-1] != "x":
+        raise ValueError(f"Invalid pattern: {pattern}")
+    return tuple(i for i, c in enumerate(pattern) if c == "x")
+
+def iter_token_chunks(file_path, field, chunk_size=CHUNK_SIZE):
+    """
+    Tokens of whole lines of a file, about chunk_size characters at a time,
+    with SEPARATORS[field] after every unit counted independently: the phrases
+    of a text file (as count_bigrams does) or the lines of a tagged file, whose
+    tokens are the tags (as process_tagged_file does).
+    """
+    if field == WORDS:
+        yield from iter_phrase_chunks(file_path, chunk_size)
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            tokens = []
+            for line in lines:
+                tokens.extend(token.split('/')[1] for token in line.split())
+                tokens.append(SEPARATORS[TAGS])
+            yield tokens
+
+def token_ids(tokens, vocab):
+    """
+    Map a chunk of tokens to an int64 id array. New tokens get the next ids;
+    each distinct token of the chunk is looked at once in Python, the rest of
+    the mapping runs in dict lookups.
+    """
+    for token in dict.fromkeys(tokens):
+        if token not in vocab:
+            vocab[token] = len(vocab)
+    return np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+def iter_id_chunks(paths, field, vocab, chunk_size=CHUNK_SIZE):
+    """
+    Map the token stream of the input files to ids, in int64 arrays with -1
+    between units. Chunks end at line breaks, so no n-gram spans two chunks.
+
+    Args:
+        vocab: Dictionary token -> id, updated in place; it must map
+            SEPARATORS[field] to -1
+    """
+    for path in paths:
+        for tokens in iter_token_chunks(path, field, chunk_size):
+            yield token_ids(tokens, vocab)
+
+def windows(ids, offsets):
+    """
+    Rows of ids at the given offsets for every window that lies inside a unit.
+    """
+    span = offsets[-1] + 1
+    if len(ids) < span:
+        return np.empty((0, len(offsets)), dtype=np.int64)
+    separators = ids < 0
+    seen = np.cumsum(separators)
+    starts = np.arange(len(ids) - span + 1)
+    inside = seen[starts + span - 1] - seen[starts] + separators[starts] == 0
+    starts = starts[inside]
+    return np.stack([ids[starts + o] for o in offsets], axis=1)
+
+def aggregate(rows, counts):
+    """
+    Sum the counts of identical rows.
+
+    Rows are packed into one int64 key per row (bits per id times the order)
+    when they fit; otherwise whole rows are compared. Packed keys are summed
+    with bincount when their range is not much larger than the number of
+    rows (e.g. unigrams) and with a sort otherwise.
+
+    Returns:
+        Tuple (unique rows in id order, counts)
+    """
+    if len(rows) == 0:
+        return rows, counts
+    order = rows.shape[1]
+    bits = max(int(rows.max()).bit_length(), 1)
+    if bits * order > 63:
+        unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+        return unique, np.bincount(inverse.ravel(), weights=counts, minlength=len(unique)).astype(np.int64)
+
+    keys = np.zeros(len(rows), dtype=np.int64)
+    for j in range(order):
+        keys = (keys << bits) | rows[:, j]
+    if 1 << (bits * order) <= 4 * len(rows):
+        totals = np.bincount(keys, weights=counts)
+        keys = np.flatnonzero(totals)
+        totals = totals[keys].astype(np.int64)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=counts, minlength=len(keys)).astype(np.int64)
+    mask = (1 << bits) - 1
+    unique = np.stack([(keys >> (bits * (order - 1 - j))) & mask for j in range(order)], axis=1)
+    return unique, totals
+
+def merge_partial(partial):
+    """
+    Merge (rows, counts) aggregates into one.
+    """
+    return aggregate(np.concatenate([rows for rows, _ in partial]),
+                     np.concatenate([counts for _, counts in partial]))
+
+def count_ngrams(paths, field, patterns, chunk_size=CHUNK_SIZE):
+    """
+    Count several n-gram and skip-gram patterns in a single pass.
+
+    Args:
+        paths: Input files (text for words, tagger output for tags)
+        field: WORDS or TAGS
+        patterns: Patterns such as "xx", "xxxx" or "x_x"
+        chunk_size: Number of characters tokenized and aggregated at a time
+    Returns:
+        Dictionary pattern -> dictionary key tuple -> count
+    """
+    offsets = {pattern: parse_pattern(pattern) for pattern in patterns}
+    # The separator takes slot 0 of the vocabulary, so ids index list(vocab)
+    vocab = {SEPARATORS[field]: -1}
+    partial = {pattern: [] for pattern in patterns}
+    for ids in iter_id_chunks(paths, field, vocab, chunk_size):
+        for pattern in patterns:
+            rows = windows(ids, offsets[pattern])
+            partial[pattern].append(aggregate(rows, np.ones(len(rows), dtype=np.int64)))
+            if sum(len(rows) for rows, _ in partial[pattern]) > MERGE_ROWS:
+                partial[pattern] = [merge_partial(partial[pattern])]
+
+    words = np.array(list(vocab), dtype=object)
+    result = {}
+    for pattern in patterns:
+        if not partial[pattern]:
+            result[pattern] = {}
+            continue
+        rows, counts = merge_partial(partial[pattern])
+        keys = zip(*(words[rows[:, j]] for j in range(rows.shape[1])))
+        result[pattern] = dict(zip(keys, counts.tolist()))
+    return result
+
+def output_path(prefix, field, pattern):
+    """
+    Output file and table kind of a pattern: word bigrams and tag trigrams
+    use the .bigrams and .tritags conventions, everything else .ngrams.
+    """
+    if field == WORDS and pattern == "xx":
+        return f"{prefix}.bigrams", "bigrams"
+    if field == TAGS and pattern == "xxx":
+        return f"{prefix}.tritags", "tritags"
+    return f"{prefix}.{field}.{pattern}.ngrams", "ngrams"
+
+def read_ngrams(file_path):
+    return read_table(file_path, lambda line: None)
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "count":
+        if len(sys.argv) < 6:
+            print("Usage: python ngrams.py count <words|tags> <input_path> <output_prefix> <pattern> [pattern ...]")
+            sys.exit(1)
+
+        field = sys.argv[2]
+        input_path = sys.argv[3]
+        output_prefix = sys.argv[4]
+        patterns = sys.argv[5:]
+
+        if field not in (WORDS, TAGS):
+            print(f"Unknown field: {field}")
+            sys.exit(1)
+
+        if not os.path.exists(input_path):
+            print("Error. Provided input path does not exist. Exiting.")
+            sys.exit(1)
+
+        try:
+            result = count_ngrams(list_inputs(input_path), field, patterns)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        for pattern, table in result.items():
+            file_path, kind = output_path(output_prefix, field, pattern)
+            write_table(file_path, kind, table)
+            print(f"{pattern} counts written to: {file_path}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
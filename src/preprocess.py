@@ -2,6 +2,9 @@ import sys
 import re
 import os
 
+from tokenizer import LETTERS, tokens
+from batch import atomic_write, list_documents, Checkpoint, CHECKPOINT_FILE, run_batch, memory_limit
+
 preprocitions = [ 'a', 'á', 'ante', 'bajo', 'cabe', 'con', 'contra', 'de', 'desde',
                   'durante', 'en', 'entre', 'hacia', 'hasta', 'mediante',
                   'para', 'por', 'según', 'sin', 'so', 'sobre', 'tras',
@@ -45,7 +48,7 @@ def replace_punctuation(word):
     Returns:
         Cleaned text string
     """
-    word = re.sub(r'[^a-zA-Záéíóúüñ]', ' ', word)
+    word = re.sub(f'[^{LETTERS}]', ' ', word)
     return re.sub(r'  +', ' ', word).strip()
 
 def process_file(input_path, output_path):
@@ -58,24 +61,9 @@ def process_file(input_path, output_path):
     Returns:
         Dictionary with words as keys and counts as values
     """ 
-    try:
-        with open(input_path, 'r', encoding='utf-8') as input_file, open(output_path, 'w', encoding='utf-8') as output_file:
-            for line in input_file:
-                line = line.lower()
-                line = re.sub(r'[^a-zA-Záéíóúüñ:;,.¿¡?!]', ' ', line)
-                line = line.replace(':', ' : ')
-                line = line.replace(';', ' ; ')
-                line = line.replace('.', ' . ')
-                line = line.replace(',', ' , ')
-                line = line.replace('¿', ' ¿ ')
-                line = line.replace('?', ' ? ')
-                line = line.replace('¡', ' ¡ ')
-                line = line.replace('!', ' ! ')
-                line = re.sub(r'  +', ' ', line).strip()
-                
-                output_file.write(line+ '\n')
-    except Exception as e:
-        print(f"Error processing file {input_path}: {e}")
+    with open(input_path, 'r', encoding='utf-8') as input_file, atomic_write(output_path) as output_file:
+        for line in input_file:
+            output_file.write(" ".join(tokens(line)) + '\n')
 
 
 
@@ -95,8 +83,12 @@ def main():
         output_file = sys.argv[3]
 
         print(f"Preprocessing file: {input_file}")
+        try:
+            process_file(input_file, output_file)
+        except Exception as e:
+            print(f"Error processing file {input_file}: {e}")
+            sys.exit(1)
         print(f"Preprocessed data saved to: {output_file}")
-        process_file(input_file, output_file)
 
     elif command == "preprocess-batch":
         if len(sys.argv) != 4:
@@ -114,13 +106,15 @@ def main():
             print("Error. Provided output directory does not exist. Exiting.")
             sys.exit(1)
 
-        for filename in os.listdir(input_directory):
-            input_path = os.path.join(input_directory, filename)
-            output_path = os.path.join(output_directory, filename)
-
+        def preprocess(input_path):
+            output_path = os.path.join(output_directory, os.path.basename(input_path))
             print(f"Preprocessing file: {input_path}")
             process_file(input_path, output_path)
             print(f"Preprocessed data saved to: {output_path}")
+            return output_path
+
+        checkpoint = Checkpoint(os.path.join(output_directory, CHECKPOINT_FILE), {"command": "preprocess-batch"})
+        run_batch(list_documents(input_directory), preprocess, checkpoint, memory_limit())
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -0,0 +1,236 @@
+import sys
+import os
+import atexit
+import functools
+import hashlib
+import pickle
+from collections import OrderedDict
+
+MEMORY_BYTES = 256 * 1024 * 1024
+DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+cache_instance = None
+loaded_tables = {}
+reused_files = set()
+
+def help():
+    print("Usage: python querycache.py <command>")
+    print("List of commands:")
+    print("  stats <cache_directory>")
+    print("  clear <cache_directory>")
+
+def file_identity(file_path):
+    """
+    Identity of an input file: any change of path, mtime or size
+    invalidates the cached results computed from it.
+    """
+    st = os.stat(file_path)
+    return (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+
+class QueryCache:
+    """
+    Query-result cache with an in-memory LRU tier bounded in bytes and an
+    optional on-disk tier with size-based eviction of the least recently
+    used entries.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BYTES, cache_dir=None, disk_max_bytes=DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, name, files, args):
+        identity = (name, tuple(file_identity(f) for f in files), args)
+        return hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, name, files, args, compute):
+        """
+        Return the cached result of a query or compute and store it.
+
+        Args:
+            name: Query name
+            files: Input files the result depends on
+            args: Normalised query arguments (must have a stable repr)
+            compute: Function without arguments computing the result;
+                if it raises, nothing is cached and the exception propagates
+        """
+        key = self.key(name, files, args)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            self.counters["memory_hits"] += 1
+            return self.entries[key][0]
+
+        payload = self.read_disk(key)
+        if payload is not None:
+            self.counters["hits"] += 1
+            self.counters["disk_hits"] += 1
+            value = pickle.loads(payload)
+            self.store_memory(key, value, len(payload))
+            return value
+
+        self.counters["misses"] += 1
+        value = compute()
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.store_memory(key, value, len(payload))
+        self.write_disk(key, payload)
+        return value
+
+    def store_memory(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.memory_bytes -= evicted
+            self.counters["evictions"] += 1
+
+    def disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self.disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            os.utime(path)
+            return payload
+        except OSError:
+            return None
+
+    def write_disk(self, key, payload):
+        if self.cache_dir is None or len(payload) > self.disk_max_bytes:
+            return
+        path = self.disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self.counters["disk_evictions"] += evict_disk(self.cache_dir, self.disk_max_bytes)
+
+    def stats(self):
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.entries)
+        stats["memory_bytes"] = self.memory_bytes
+        return stats
+
+def disk_entries(cache_dir):
+    entries = []
+    for f in os.listdir(cache_dir):
+        if f.endswith(".pkl"):
+            path = os.path.join(cache_dir, f)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+def evict_disk(cache_dir, max_bytes):
+    """
+    Remove the least recently used disk entries until the cache fits in
+    max_bytes. Returns the number of removed entries.
+    """
+    entries = sorted(disk_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+def print_stats(cache):
+    stats = cache.stats()
+    print("Query cache: " + ", ".join(f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+                                      for name, value in stats.items()), file=sys.stderr)
+
+def default_cache():
+    """
+    Process-wide cache configured from the environment:
+    DICCIONARIOS_CACHE_DIR enables the disk tier, DICCIONARIOS_CACHE_BYTES and
+    DICCIONARIOS_CACHE_DISK_BYTES set the budgets and DICCIONARIOS_CACHE_STATS
+    prints the hit/miss metrics when the process exits.
+    """
+    global cache_instance
+    if cache_instance is None:
+        cache_instance = QueryCache(
+            max_bytes=int(os.environ.get("DICCIONARIOS_CACHE_BYTES", MEMORY_BYTES)),
+            cache_dir=os.environ.get("DICCIONARIOS_CACHE_DIR") or None,
+            disk_max_bytes=int(os.environ.get("DICCIONARIOS_CACHE_DISK_BYTES", DISK_BYTES)),
+        )
+        if os.environ.get("DICCIONARIOS_CACHE_STATS"):
+            atexit.register(print_stats, cache_instance)
+    return cache_instance
+
+def keep_loaded_tables(file_paths):
+    """
+    Keep the tables read from file_paths for the commands that follow, so
+    chained commands do not read the same file twice. Tables of any other
+    file are dropped, and files not listed are never kept.
+    """
+    global reused_files
+    reused_files = {os.path.abspath(p) for p in file_paths}
+    for key in [key for key in loaded_tables if key[2][0] not in reused_files]:
+        del loaded_tables[key]
+
+def reusable_table(read):
+    """
+    Decorator for table readers. Reading an unchanged file listed in
+    keep_loaded_tables again returns the table already loaded; callers must
+    not modify it.
+    """
+    @functools.wraps(read)
+    def wrapper(file_path, *args, **kwargs):
+        if os.path.abspath(file_path) not in reused_files:
+            return read(file_path, *args, **kwargs)
+        key = (read.__module__, read.__name__, file_identity(file_path), args, tuple(sorted(kwargs.items())))
+        if key not in loaded_tables:
+            loaded_tables[key] = read(file_path, *args, **kwargs)
+        return loaded_tables[key]
+    return wrapper
+
+def main():
+
+    if len(sys.argv) < 3:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+    cache_dir = sys.argv[2]
+
+    if not os.path.isdir(cache_dir):
+        print("Error. Provided cache directory does not exist. Exiting.")
+        sys.exit(1)
+
+    if command == "stats":
+        entries = disk_entries(cache_dir)
+        print(f"Entries: {len(entries)}")
+        print(f"Bytes: {sum(size for _, size, _ in entries)}")
+
+    elif command == "clear":
+        removed = evict_disk(cache_dir, 0)
+        print(f"Removed {removed} entries")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import sys
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from ngramfile import read_table_chunks, parse_fields
+from bigrams import parse_legacy_bigram
+from trigrams import parse_legacy_trigram
+
+MAGIC = 0x44494343  # "DICC"
+HEADER_FIELDS = 7
+
+legacy_parsers = {
+    ".unigrams": parse_fields,
+    ".bigrams": parse_legacy_bigram,
+    ".tritags": parse_legacy_trigram,
+}
+
+def help():
+    print("Usage: python sharedtables.py <command>")
+    print("List of commands:")
+    print("  serve <name> <table_file> [<table_file> ...]")
+    print("  lookup <name> <key> [<key> ...]")
+
+def read_count_table(file_path):
+    """
+    Read a .unigrams, .bigrams or .tritags file into key and count lists.
+    """
+    legacy_parse = legacy_parsers.get(os.path.splitext(file_path)[1], parse_fields)
+    keys, counts = [], []
+    for chunk in read_table_chunks(file_path, legacy_parse):
+        for key, count in chunk:
+            keys.append(key)
+            counts.append(count)
+    return keys, counts
+
+def pack_table(keys, counts):
+    """
+    Encode n-gram keys as sorted packed integers.
+
+    Every element of a key is replaced by its id in the sorted vocabulary and
+    the ids are packed into one int64, so sorting the packed keys sorts the
+    n-grams lexicographically.
+
+    Returns:
+        Tuple (vocab, order, bits, packed keys, counts)
+    """
+    vocab = sorted({element for key in keys for element in key})
+    ids = {element: i for i, element in enumerate(vocab)}
+    order = len(keys[0]) if keys else 1
+    bits = max(1, len(vocab).bit_length())
+    if bits * order > 63:
+        raise ValueError(f"Vocabulary of {len(vocab)} entries is too large to pack {order}-grams")
+    packed = np.zeros(len(keys), dtype=np.int64)
+    for j in range(order):
+        column = np.fromiter((ids[key[j]] for key in keys), dtype=np.int64, count=len(keys))
+        packed |= column << (bits * (order - 1 - j))
+    counts = np.asarray(counts, dtype=np.int64)
+    sort = np.argsort(packed, kind='stable')
+    return vocab, order, bits, packed[sort], counts[sort]
+
+class SharedNgramTable:
+    """
+    Read-only n-gram count table stored in a shared memory segment.
+
+    The owner process creates it with publish(); any other process attaches
+    to it by name with attach() without copying the table.
+    """
+
+    def __init__(self, shm):
+        self.shm = shm
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        magic, self.order, self.bits, nkeys, vocab_size, vocab_nbytes, self.owner_pid = (int(v) for v in header)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} is not an n-gram table")
+        offset = header.nbytes
+        self.vocab_offsets = self.view(offset, vocab_size + 1)
+        offset += self.vocab_offsets.nbytes
+        self.keys = self.view(offset, nkeys)
+        offset += self.keys.nbytes
+        self.counts = self.view(offset, nkeys)
+        offset += self.counts.nbytes
+        self.vocab_bytes = shm.buf[offset:offset + vocab_nbytes]
+        self.vocab_size = vocab_size
+
+    def view(self, offset, length):
+        array = np.ndarray((length,), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+        array.flags.writeable = False
+        return array
+
+    @classmethod
+    def publish(cls, name, keys, counts):
+        vocab, order, bits, packed, counts = pack_table(keys, counts)
+        encoded = [element.encode('utf-8') for element in vocab]
+        vocab_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=vocab_offsets[1:])
+        vocab_bytes = b''.join(encoded)
+        header = np.array([MAGIC, order, bits, len(packed), len(vocab), len(vocab_bytes), os.getpid()], dtype=np.int64)
+
+        size = header.nbytes + vocab_offsets.nbytes + packed.nbytes + counts.nbytes + len(vocab_bytes)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        offset = 0
+        for array in (header, vocab_offsets, packed, counts):
+            np.ndarray(array.shape, dtype=np.int64, buffer=shm.buf, offset=offset)[:] = array
+            offset += array.nbytes
+        shm.buf[offset:offset + len(vocab_bytes)] = vocab_bytes
+        return cls(shm)
+
+    @classmethod
+    def publish_file(cls, name, file_path):
+        keys, counts = read_count_table(file_path)
+        return cls.publish(name, keys, counts)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            return cls(shared_memory.SharedMemory(name=name, track=False))
+        except TypeError:
+            pass
+        # Python < 3.13 registers attached segments with the resource tracker,
+        # which destroys them when the tracker shuts down. The registration is
+        # dropped again unless the tracker is the owner's own one (the owner
+        # itself, or a multiprocessing child of it, which inherits it): there
+        # it would also remove the owner's registration.
+        table = cls(shared_memory.SharedMemory(name=name))
+        parent = multiprocessing.parent_process()
+        shares_owner_tracker = table.owner_pid == os.getpid() or \
+            (parent is not None and parent.pid == table.owner_pid)
+        if os.name == "posix" and not shares_owner_tracker:
+            resource_tracker.unregister(f"/{table.shm.name}", "shared_memory")
+        return table
+
+    def word(self, i):
+        return bytes(self.vocab_bytes[self.vocab_offsets[i]:self.vocab_offsets[i + 1]]).decode('utf-8')
+
+    def word_id(self, element):
+        target = element.encode('utf-8')
+        lo, hi = 0, self.vocab_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.vocab_bytes[self.vocab_offsets[mid]:self.vocab_offsets[mid + 1]]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.vocab_size and self.word(lo) == element:
+            return lo
+        return None
+
+    def pack(self, key):
+        if isinstance(key, str):
+            key = (key,)
+        if len(key) != self.order:
+            return None
+        packed = 0
+        for element in key:
+            i = self.word_id(element)
+            if i is None:
+                return None
+            packed = (packed << self.bits) | i
+        return packed
+
+    def get(self, key, default=0):
+        packed = self.pack(key)
+        if packed is None:
+            return default
+        i = np.searchsorted(self.keys, packed)
+        if i < len(self.keys) and self.keys[i] == packed:
+            return int(self.counts[i])
+        return default
+
+    def lookup(self, keys):
+        """
+        Return the counts of a batch of keys as an array (0 when missing).
+        """
+        packed = [self.pack(key) for key in keys]
+        packed = np.array([-1 if p is None else p for p in packed], dtype=np.int64)
+        if len(self.keys) == 0:
+            return np.zeros(len(packed), dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.keys, packed), len(self.keys) - 1)
+        return np.where(self.keys[i] == packed, self.counts[i], 0)
+
+    def __getitem__(self, key):
+        count = self.get(key, None)
+        if count is None:
+            raise KeyError(key)
+        return count
+
+    def __contains__(self, key):
+        return self.get(key, None) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        mask = (1 << self.bits) - 1
+        for packed, count in zip(self.keys, self.counts):
+            packed = int(packed)
+            key = tuple(self.word((packed >> (self.bits * (self.order - 1 - j))) & mask) for j in range(self.order))
+            yield key, int(count)
+
+    def close(self):
+        self.vocab_bytes.release()
+        self.vocab_offsets = self.keys = self.counts = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "serve":
+        if len(sys.argv) < 4:
+            print("Usage: python sharedtables.py serve <name> <table_file> [<table_file> ...]")
+            sys.exit(1)
+
+        name = sys.argv[2]
+        tables = []
+        try:
+            for table_file in sys.argv[3:]:
+                table_name = f"{name}_{os.path.splitext(table_file)[1][1:]}"
+                print(f"Loading {table_file}")
+                tables.append(SharedNgramTable.publish_file(table_name, table_file))
+                print(f"Published {table_file} as {table_name}")
+            print("Serving shared tables. Press Ctrl-C to stop.")
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for table in tables:
+                table.close()
+                table.unlink()
+
+    elif command == "lookup":
+        if len(sys.argv) < 4:
+            print("Usage: python sharedtables.py lookup <name> <key> [<key> ...]")
+            sys.exit(1)
+
+        table = SharedNgramTable.attach(sys.argv[2])
+        key = tuple(sys.argv[3:])
+        print(f"{key}\t{table.get(key)}")
+        table.close()
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import sys
+import os
+from array import array
+
+import numpy as np
+
+from tokenizer import tokens
+from index import get_id, position_dtype, write_vocab, read_vocab
+from batch import list_inputs
+
+VOCAB_FILE = "words.vocab"
+FILES_FILE = "files.txt"
+
+def help():
+    print("Usage: python suffixarray.py <command>")
+    print("List of commands:")
+    print("  build <preprocessed_path> <index_directory>")
+    print("  count <index_directory> <phrase>")
+    print("  concordance <index_directory> <phrase> [width] [limit]")
+
+def read_corpus(paths):
+    """
+    Map the tokens of preprocessed files to ids, with a -1 gap after every
+    line so that phrases never match across lines.
+
+    Returns:
+        Tuple (vocab, token id array, start position of every file)
+    """
+    vocab, ids = [], {}
+    token_ids = array('i')
+    file_starts = []
+    for path in paths:
+        file_starts.append(len(token_ids))
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                token_ids.extend(get_id(vocab, ids, token) for token in tokens(line))
+                token_ids.append(-1)
+    return vocab, np.frombuffer(token_ids, dtype=np.int32), np.array(file_starts, dtype=np.int64)
+
+def suffix_array(token_ids):
+    """
+    Suffix array of a token id sequence by prefix doubling: after the pass
+    with step k, suffixes are sorted by their first 2k tokens. Every pass is
+    one stable argsort of packed (rank, next rank) keys.
+
+    Returns:
+        Array with the start positions of the suffixes in sorted order
+    """
+    n = len(token_ids)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    rank = token_ids.astype(np.int64) + 1
+    order = np.argsort(rank, kind='stable')
+    sorted_rank = rank[order]
+    rank[order] = np.cumsum(np.concatenate(([0], sorted_rank[1:] != sorted_rank[:-1])))
+    k = 1
+    while rank[order[-1]] < n - 1:
+        second = np.zeros(n, dtype=np.int64)
+        second[:n - k] = rank[k:] + 1
+        keys = rank * (n + 1) + second
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        rank[order] = np.cumsum(np.concatenate(([0], sorted_keys[1:] != sorted_keys[:-1])))
+        k *= 2
+    return order
+
+def build_suffix_index(paths, index_dir):
+    """
+    Build a suffix array index over preprocessed files.
+
+    Args:
+        paths: Preprocessed files (output of preprocess.py)
+        index_dir: Directory where the index is written
+    """
+    vocab, token_ids, file_starts = read_corpus(paths)
+    np.save(os.path.join(index_dir, "tokens.npy"), token_ids)
+    np.save(os.path.join(index_dir, "suffixes.npy"), suffix_array(token_ids).astype(position_dtype(len(token_ids))))
+    np.save(os.path.join(index_dir, "file_starts.npy"), file_starts)
+    write_vocab(os.path.join(index_dir, VOCAB_FILE), vocab)
+    write_vocab(os.path.join(index_dir, FILES_FILE), paths)
+
+def load_suffix_index(index_dir):
+    """
+    Open an index built by build_suffix_index. Arrays are memory-mapped.
+    """
+    vocab = read_vocab(os.path.join(index_dir, VOCAB_FILE))
+    return {
+        "vocab": vocab,
+        "ids": {word: i for i, word in enumerate(vocab)},
+        "files": read_vocab(os.path.join(index_dir, FILES_FILE)),
+        "tokens": np.load(os.path.join(index_dir, "tokens.npy"), mmap_mode='r'),
+        "suffixes": np.load(os.path.join(index_dir, "suffixes.npy"), mmap_mode='r'),
+        "file_starts": np.load(os.path.join(index_dir, "file_starts.npy"), mmap_mode='r'),
+    }
+
+def phrase_ids(index, phrase):
+    """
+    Token ids of a phrase, None if a word is not in the corpus.
+    """
+    try:
+        return [index["ids"][token] for token in tokens(phrase)]
+    except KeyError:
+        return None
+
+def search(index, query, upper=False):
+    """
+    First suffix whose leading tokens are >= query (> query if upper).
+    """
+    token_ids, suffixes = index["tokens"], index["suffixes"]
+    lo, hi = 0, len(suffixes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = int(suffixes[mid])
+        prefix = token_ids[start:start + len(query)].tolist()
+        if prefix < query or (upper and prefix == query):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def phrase_range(index, phrase):
+    """
+    Range [start, end) of the suffix array whose suffixes begin with phrase.
+    """
+    query = phrase_ids(index, phrase)
+    if not query:
+        return 0, 0
+    return search(index, query), search(index, query, upper=True)
+
+def count_phrase(index, phrase):
+    start, end = phrase_range(index, phrase)
+    return end - start
+
+def phrase_positions(index, phrase):
+    """
+    Sorted corpus positions of every occurrence of phrase.
+    """
+    start, end = phrase_range(index, phrase)
+    return np.sort(np.asarray(index["suffixes"][start:end], dtype=np.int64))
+
+def context(index, position, length, width):
+    """
+    Words around an occurrence, within its line.
+
+    Returns:
+        Tuple (file, left words, phrase words, right words)
+    """
+    token_ids, vocab = index["tokens"], index["vocab"]
+
+    def words(ids):
+        return [vocab[i] for i in ids]
+
+    left = token_ids[max(0, position - width):position].tolist()
+    if -1 in left:
+        left = left[len(left) - left[::-1].index(-1):]
+    right = token_ids[position + length:position + length + width].tolist()
+    if -1 in right:
+        right = right[:right.index(-1)]
+    file_id = int(np.searchsorted(index["file_starts"], position, side='right')) - 1
+    return index["files"][file_id], words(left), words(token_ids[position:position + length].tolist()), words(right)
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "build":
+        if len(sys.argv) != 4:
+            print("Usage: python suffixarray.py build <preprocessed_path> <index_directory>")
+            sys.exit(1)
+
+        input_path = sys.argv[2]
+        index_dir = sys.argv[3]
+
+        if not os.path.exists(input_path):
+            print("Error. Provided input path does not exist. Exiting.")
+            sys.exit(1)
+
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir)
+
+        build_suffix_index(list_inputs(input_path), index_dir)
+        print(f"Suffix array written to: {index_dir}")
+
+    elif command == "count":
+        if len(sys.argv) != 4:
+            print("Usage: python suffixarray.py count <index_directory> <phrase>")
+            sys.exit(1)
+
+        index = load_suffix_index(sys.argv[2])
+        print(f"{sys.argv[3]}\t{count_phrase(index, sys.argv[3])}")
+
+    elif command == "concordance":
+        if len(sys.argv) < 4:
+            print("Usage: python suffixarray.py concordance <index_directory> <phrase> [width] [limit]")
+            sys.exit(1)
+
+        index = load_suffix_index(sys.argv[2])
+        phrase = sys.argv[3]
+        width = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+        limit = int(sys.argv[5]) if len(sys.argv) > 5 else 20
+
+        length = len(tokens(phrase))
+        for position in phrase_positions(index, phrase)[:limit]:
+            file_path, left, match, right = context(index, int(position), length, width)
+            print(f"{file_path}\t{position}\t{' '.join(left)} [{' '.join(match)}] {' '.join(right)}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
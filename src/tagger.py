@@ -3,6 +3,8 @@ import os
 
 from preprocess import stopwords
 from bigrams import read_tagged
+from tokenizer import tokens
+from batch import atomic_write, list_files, list_documents, Checkpoint, CHECKPOINT_FILE, run_batch, memory_limit
 
 def tag_file(input_path, word_tags, output_path):
     """
@@ -14,25 +16,21 @@ def tag_file(input_path, word_tags, output_path):
         output_path: Path to the output tagged file
     """
 
-    try:
-        with open(input_path, 'r', encoding='utf-8') as input_file, open(output_path, 'w', encoding='utf-8') as output_file:
-            
-            for line in input_file:
-                words = line.strip().split()
-                tagged = []
-                for word in words:
-                    if word in [":", ";", ".", ",", "!", "?", "¡", "¿"]:
-                        tagged.append(word+"/"+word)
-                    elif word in stopwords:
-                        tagged.append(word+"/"+word.upper())
-                    elif word in word_tags:
-                        tagged.append(word+"/"+word_tags[word])
-                    else:
-                        tagged.append(word+"/UNK")  # Default tag
-                output_file.write(" ".join(tagged) + "\n")
-
-    except Exception as e:
-        print(f"Error processing file {input_path}: {e}")   
+    with open(input_path, 'r', encoding='utf-8') as input_file, atomic_write(output_path) as output_file:
+        
+        for line in input_file:
+            words = tokens(line)
+            tagged = []
+            for word in words:
+                if word in [":", ";", ".", ",", "!", "?", "¡", "¿"]:
+                    tagged.append(word+"/"+word)
+                elif word in stopwords:
+                    tagged.append(word+"/"+word.upper())
+                elif word in word_tags:
+                    tagged.append(word+"/"+word_tags[word])
+                else:
+                    tagged.append(word+"/UNK")  # Default tag
+            output_file.write(" ".join(tagged) + "\n")
 
 
 def help():
@@ -58,7 +56,11 @@ def main():
             for word in words:
                 categories[word] = tag
 
-        tag_file(input_file, categories, output_file)
+        try:
+            tag_file(input_file, categories, output_file)
+        except Exception as e:
+            print(f"Error processing file {input_file}: {e}")
+            sys.exit(1)
         
     elif command == "tag-batch":
         if len(sys.argv) != 4:
@@ -87,11 +89,14 @@ def main():
         for tag, words in tagged_data.items():
             for word in words:
                 categories[word] = tag
-        for f in os.listdir(input_dir):
-            input_path = os.path.join(input_dir, f)
+        def tag(input_path):
             output_file = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}.tagged")
             tag_file(input_path, categories, output_file)
             print(f"Tagged file written to: {output_file}")
+            return output_file
+
+        checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_FILE), {"command": "tag-batch", "tags": sys.argv[4] if len(sys.argv) > 4 else None})
+        run_batch(list_documents(input_dir), tag, checkpoint, memory_limit())
 
     elif command == "merge":
         if len(sys.argv) != 4:
@@ -108,12 +113,8 @@ def main():
             print("Error. Parent directory of output file does not exist. Exiting.")
             sys.exit(1)
 
-        if os.path.exists(output_file):
-            os.remove(output_file)
-
-        with open(output_file, 'a') as out_f:
-            for f in os.listdir(input_dir):
-                input_file = os.path.join(input_dir, f)
+        with atomic_write(output_file) as out_f:
+            for input_file in list_files(input_dir):
                 with open(input_file, 'r', encoding='utf-8') as in_f:
                     content = in_f.read()
                     out_f.write(content + "\n")
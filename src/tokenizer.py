@@ -0,0 +1,125 @@
+import sys
+import re
+
+LETTERS = "a-zA-ZáéíóúüñÁÉÍÓÚÜÑ"
+PUNCTUATION = ":;,.¿¡?!"
+SENTENCE_END = ".?!"
+CHUNK_SIZE = 1 << 20
+
+WORD_RE = re.compile(f"[{LETTERS}]+")
+TOKEN_RE = re.compile(f"[{LETTERS}]+|[{re.escape(PUNCTUATION)}]")
+PHRASE_RE = re.compile(f"[{LETTERS}]+(?: +[{LETTERS}]+)*")
+PHRASE_BREAK = "|"
+PHRASE_BREAK_RE = re.compile(f"[^{LETTERS} ]+")
+
+def help():
+    print("Usage: python tokenizer.py <command>")
+    print("List of commands:")
+    print("  words <input_file>")
+    print("  sentences <input_file>")
+
+def words(line):
+    """
+    Lowercased words of a line; every character outside the Spanish
+    alphabet separates words.
+    """
+    return WORD_RE.findall(line.lower())
+
+def tokens(line):
+    """
+    Lowercased words and punctuation marks of a line, as written by
+    preprocess.py.
+    """
+    return TOKEN_RE.findall(line.lower())
+
+def phrases(line):
+    """
+    Word lists of a line split at every character that is neither a letter nor
+    a space (punctuation, digits, symbols). Bigrams are counted within phrases.
+    """
+    return [phrase.split() for phrase in PHRASE_RE.findall(line.lower())]
+
+def phrase_tokens(text):
+    """
+    Lowercased words of a text of any number of lines, with PHRASE_BREAK
+    wherever phrases() ends a phrase. One regex pass over the whole text, for
+    counters that read many lines at a time.
+    """
+    return PHRASE_BREAK_RE.sub(f" {PHRASE_BREAK} ", text.lower()).split()
+
+def iter_phrase_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Stream the phrase tokens of a file, about chunk_size characters of whole
+    lines at a time. This is the token stream of the counters: the words of
+    phrases(), each phrase ending with PHRASE_BREAK, so no phrase spans two
+    chunks.
+
+    Yields:
+        Lists of lowercased words and PHRASE_BREAK
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            chunk = phrase_tokens("".join(lines))
+            chunk.append(PHRASE_BREAK)
+            yield chunk
+
+def iter_sentences(lines):
+    """
+    Stream the sentences of a text.
+
+    Sentences end at '.', '?', '!' and at blank lines, and may span line
+    breaks. Other punctuation is dropped.
+
+    Args:
+        lines: Iterable of lines (e.g. an open file)
+    Yields:
+        Lists of lowercased words
+    """
+    sentence = []
+    for line in lines:
+        line_tokens = TOKEN_RE.findall(line.lower())
+        if not line_tokens and sentence:
+            yield sentence
+            sentence = []
+        for token in line_tokens:
+            if token in SENTENCE_END:
+                if sentence:
+                    yield sentence
+                    sentence = []
+            elif token not in PUNCTUATION:
+                sentence.append(token)
+    if sentence:
+        yield sentence
+
+def iter_file_sentences(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from iter_sentences(f)
+
+def main():
+
+    if len(sys.argv) < 3:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+    input_file = sys.argv[2]
+
+    if command == "words":
+        with open(input_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                print(" ".join(words(line)))
+
+    elif command == "sentences":
+        for sentence in iter_file_sentences(input_file):
+            print(" ".join(sentence))
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
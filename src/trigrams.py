@@ -1,8 +1,10 @@
 import os
 import sys
+import ast
 
-import numpy as np
-import scipy.sparse as sp
+from ngramfile import iter_table, read_table, write_table, write_entries, migrate_table
+from querycache import default_cache, reusable_table
+from batch import list_files, list_documents, Checkpoint, CHECKPOINT_FILE, run_batch, merge_batch, memory_limit, count_backend, NUMPY_BACKEND
 #from scipy.sparse import lil_array
 
 def help():
@@ -10,38 +12,45 @@ def help():
     print("List of commands:")
     print("  ")
 
-def process_tagged_file(file_path):
+def process_tagged_file(file_path, backend=None):
     """
     Process a tagged file and count trigram occurrences.
     
     Args:
         file_path: Path to the tagged file
+        backend: PYTHON_BACKEND or NUMPY_BACKEND, count_backend() if None
     Returns:
         Dictionary with trigrams as keys and counts as values
     """
     trigram_count = {}
+    backend = backend or count_backend()
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                 
-                tags = [token.split('/')[1] for token in line.strip().split()]
-                for i in range(len(tags) - 2):
-                    trigram = (tags[i], tags[i + 1], tags[i + 2])
-                    trigram_count[trigram] = trigram_count.get(trigram, 0) + 1
-
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
-        return {}
+    if backend == NUMPY_BACKEND:
+        from ngrams import count_ngrams, TAGS
+        return count_ngrams([file_path], TAGS, ["xxx"])["xxx"]
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+             
+            tags = [token.split('/')[1] for token in line.strip().split()]
+            for i in range(len(tags) - 2):
+                trigram = (tags[i], tags[i + 1], tags[i + 2])
+                trigram_count[trigram] = trigram_count.get(trigram, 0) + 1
     
     return trigram_count
 
 def write_trigrams(file_path, trigrams, threshold=0):
-    with open(file_path, 'w', encoding='utf-8') as out_f:
-        for trigram, count in sorted(trigrams.items()):
-            if count >= threshold:
-                out_f.write(f"{trigram}\t{count}\n")
+    write_table(file_path, "tritags", trigrams, threshold)
 
+def write_trigram_entries(file_path, entries, threshold=0):
+    write_entries(file_path, "tritags", entries, threshold)
+
+def parse_legacy_trigram(line):
+    parts = line.strip().split('\t')
+    if len(parts) != 2:
+        return None
+    return tuple(ast.literal_eval(parts[0])), int(parts[1])
+
+@reusable_table
 def read_trigrams(file_path):
     """
     Read a trigram file and return a trigram count dictionary.
@@ -51,15 +60,27 @@ def read_trigrams(file_path):
     Returns:
         Dictionary with trigrams as keys and counts as values
     """
-    trigram_count = {}
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) == 2:
-                trigram_str, count = parts
-                trigram = tuple(trigram_str.strip("()").replace("'", "").split(", "))
-                trigram_count[trigram] = int(count)
-    return trigram_count
+    return read_table(file_path, parse_legacy_trigram)
+
+def iter_trigrams(file_path, query=None, min_count=None, max_count=None, predicate=None, skip_unknown=False):
+    """
+    Stream the entries of a trigram file that pass the given filters.
+
+    Args:
+        file_path: Path to the trigram file
+        query: Optional tuple with three tags, "*" matches any tag. Leading
+            fixed tags are located with a binary search over the sorted file.
+        min_count: Minimum count (inclusive)
+        max_count: Maximum count (inclusive)
+        predicate: Optional function trigram -> bool
+        skip_unknown: Skip trigrams containing the UNK tag
+    Yields:
+        (trigram, count) tuples in file order
+    """
+    if skip_unknown:
+        key_predicate = predicate
+        predicate = lambda trigram: 'UNK' not in trigram and (key_predicate is None or key_predicate(trigram))
+    return iter_table(file_path, parse_legacy_trigram, query, min_count, max_count, predicate)
 
 def query_tag_trigrams(trigrams, query, threshold=0, skip_unknown=False):
     """
@@ -99,23 +120,32 @@ def find_words_from_pattern(tagged_file_path, start_tag, end_tag):
 
     word_count = {}
     # Logic to find words based on the query pattern would go here.
-    try:
-        with open(tagged_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                 
-                tags = [token.split('/') for token in line.strip().split()]
-                for i in range(len(tags) - 2):
-                    if (tags[i][1] == start_tag) and \
-                       (tags[i + 1][1] == "UNK") and \
-                       (tags[i + 2][1] == end_tag):
-                        word = tags[i + 1][0]
-                        word_count[word] = word_count.get(word, 0) + 1
-                        
+    with open(tagged_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+             
+            tags = [token.split('/') for token in line.strip().split()]
+            for i in range(len(tags) - 2):
+                if (tags[i][1] == start_tag) and \
+                   (tags[i + 1][1] == "UNK") and \
+                   (tags[i + 2][1] == end_tag):
+                    word = tags[i + 1][0]
+                    word_count[word] = word_count.get(word, 0) + 1
+                    
+    return word_count
 
+def cached_words_from_pattern(tagged_file_path, start_tag, end_tag):
+    """
+    find_words_from_pattern through the query cache; the threshold is applied
+    by the caller so that one entry serves every threshold. A file that cannot
+    be processed is reported and gives an empty result, which is not cached.
+    """
+    try:
+        return default_cache().get_or_compute(
+            "trigrams.search-words-by-pattern", [tagged_file_path], (start_tag, end_tag),
+            lambda: find_words_from_pattern(tagged_file_path, start_tag, end_tag))
     except Exception as e:
         print(f"Error processing file {tagged_file_path}: {e}")
         return {}
-    return word_count
 
 def find_relations_from_pattern(tagged_file_path, pattern):
     """
@@ -164,7 +194,11 @@ def main():
         input_file = sys.argv[2]
         output_file = sys.argv[3]
 
-        trigrams = process_tagged_file(input_file)
+        try:
+            trigrams = process_tagged_file(input_file)
+        except Exception as e:
+            print(f"Error processing file {input_file}: {e}")
+            sys.exit(1)
         try:
             write_trigrams(output_file, trigrams)
         except Exception as e:
@@ -189,17 +223,14 @@ def main():
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
 
-        for filename in os.listdir(input_directory):
-            input_path = os.path.join(input_directory, filename)
-            output_path = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(filename))[0]}.tritags")
-
+        def create(input_path):
+            output_path = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_path))[0]}.tritags")
             print(f"Processing file: {input_path}")
-            trigrams = process_tagged_file(input_path)
-            try:
-                write_trigrams(output_path, trigrams)
-                print(f"Trigrams written to: {output_path}")
-            except Exception as e:
-                print(f"Error writing trigrams to file {output_path}: {e}")
+            write_trigrams(output_path, process_tagged_file(input_path))
+            print(f"Trigrams written to: {output_path}")
+            return output_path
+
+        run_batch(list_documents(input_directory), create, Checkpoint(os.path.join(output_directory, CHECKPOINT_FILE), {"command": "trigrams create-batch"}), memory_limit())
 
     elif command == "merge-batch":
         if len(sys.argv) != 4:
@@ -209,23 +240,20 @@ def main():
         input_directory = sys.argv[2]
         output_file = sys.argv[3]
 
-        merged_trigrams = {}
+        merge_batch(list_files(input_directory), output_file, read_trigrams, iter_trigrams,
+                    write_trigram_entries, 0, memory_limit())
+        print(f"Merged trigrams written to: {output_file}")
 
-        for filename in os.listdir(input_directory):
-            input_path = os.path.join(input_directory, filename)
-            try:
-                print(f"Merging trigrams from file: {input_path}")
-                trigrams = read_trigrams(input_path)
-                for trigram, count in trigrams.items():
-                    merged_trigrams[trigram] = merged_trigrams.get(trigram, 0) + count
-            except Exception as e:
-                print(f"Error reading trigrams from file {input_path}: {e}")
+    elif command == "migrate":
+        if len(sys.argv) < 3:
+            print("Usage: python trigrams.py migrate <input_file> [output_file]")
+            sys.exit(1)
 
-        try:
-            write_trigrams(output_file, merged_trigrams)
-            print(f"Merged trigrams written to: {output_file}")
-        except Exception as e:
-            print(f"Error writing merged trigrams to file {output_file}: {e}")
+        input_file = sys.argv[2]
+        output_file = sys.argv[3] if len(sys.argv) > 3 else input_file
+
+        migrate_table(input_file, output_file, "tritags", parse_legacy_trigram)
+        print(f"Trigrams written to: {output_file}")
 
     elif command == "query-tag-trigrams":
         if len(sys.argv) < 8:
@@ -235,13 +263,15 @@ def main():
         input_file = sys.argv[2]
         output_file = sys.argv[3]
 
-        trigrams = read_trigrams(input_file)
         target_tag1 = sys.argv[4]
         target_tag2 = sys.argv[5]
         target_tag3 = sys.argv[6]
         threshold1 = int(sys.argv[7])
 
-        results = query_tag_trigrams(trigrams, (target_tag1, target_tag2, target_tag3), threshold=threshold1)
+        query = (target_tag1, target_tag2, target_tag3)
+        results = default_cache().get_or_compute(
+            "trigrams.query-tag-trigrams", [input_file], (query, threshold1),
+            lambda: list(iter_trigrams(input_file, query, min_count=threshold1)))
         for trigram, count in results:
             print(trigram, " --> total:", count)
 
@@ -330,7 +360,7 @@ def main():
         tag1 = sys.argv[3]
         tag3 = sys.argv[4]
         threshold = int(sys.argv[5])
-        result = find_words_from_pattern(input_file, tag1, tag3)
+        result = cached_words_from_pattern(input_file, tag1, tag3)
         for word, count in result.items():
             if count >= threshold:
                 print(f"{word}")
@@ -340,6 +370,9 @@ def main():
             print("Usage: python trigrams.py search-words-by-pattern <input_file> <tag1> <tag2> <tag3> threshold")
             sys.exit(1)
 
+        import numpy as np
+        import scipy.sparse as sp
+
         rules_file = sys.argv[2]
         input_file = sys.argv[3]
         output_file = sys.argv[4]
@@ -359,7 +392,7 @@ def main():
             #for line in test:
                 vector = []
                 (tag1, tag3) = line.strip().split()
-                result = find_words_from_pattern(input_file, tag1, tag3)
+                result = cached_words_from_pattern(input_file, tag1, tag3)
                 #result = test_words(tag3)
                 for word, count in result.items():
                     try:
@@ -1,7 +1,11 @@
 import sys
 import os
 
-from preprocess import replace_punctuation, stopwords
+from preprocess import stopwords
+from tokenizer import iter_phrase_chunks, PHRASE_BREAK
+from ngramfile import iter_table
+from querycache import default_cache, reusable_table
+from batch import atomic_write, list_files, list_documents, Checkpoint, CHECKPOINT_FILE, run_batch, merge_batch, memory_limit
 
 def help():
     print("Usage: python unigrams.py <command>")
@@ -20,28 +24,14 @@ def process_file(file_path):
     """
     word_count = {}
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                candidates = line.lower().split()
-                for candidate in candidates:
-                    # Remove punctuation if needed
-                    
-                    #translator = str.maketrans('', '', string.punctuation)
-                    #word = word.translate(translator)
-                    
-                    #word = word.strip('.,¡!¿?;:-"\'()[]	_$1234567890%*&^#@`~«»•“”‘’')
-                    clean_candidate = replace_punctuation(candidate)
-                    tokens = clean_candidate.strip().split()
-                    for word in tokens:
-                        if word:
-                            word_count[word] = word_count.get(word, 0) + 1
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
-        return {}
+    for chunk in iter_phrase_chunks(file_path):
+        for word in chunk:
+            word_count[word] = word_count.get(word, 0) + 1
+    word_count.pop(PHRASE_BREAK, None)
     
     return word_count
 
+@reusable_table
 def read_unigrams(file_path):
     """
     Read a dictionary file and return a word count dictionary.
@@ -62,9 +52,38 @@ def read_unigrams(file_path):
     
     return word_count
 
+def parse_unigram(line):
+    parts = line.strip().split('\t')
+    if len(parts) != 2:
+        return None
+    return parts[0], int(parts[1])
+
+def iter_unigrams(file_path, min_count=None, max_count=None, prefix=None, predicate=None):
+    """
+    Stream the entries of a unigrams file that pass the given filters.
+
+    Args:
+        file_path: Path to the unigrams file
+        min_count: Minimum count (inclusive)
+        max_count: Maximum count (inclusive)
+        prefix: Only yield words starting with this prefix. The sorted file
+            order is used to jump directly to the prefix range.
+        predicate: Optional function word -> bool
+    Yields:
+        (word, count) tuples in file order
+    """
+    return iter_table(file_path, parse_unigram, min_count=min_count, max_count=max_count,
+                      predicate=predicate, prefix=prefix or "")
+
 def write_unigrams(file_path, unigrams, threshold=0):
-    with open(file_path, 'w', encoding='utf-8') as out_f:
-        for word, count in sorted(unigrams.items()):
+    write_unigram_entries(file_path, sorted(unigrams.items()), threshold)
+
+def write_unigram_entries(file_path, entries, threshold=0):
+    """
+    Write sorted (word, count) entries; the file is replaced atomically.
+    """
+    with atomic_write(file_path) as out_f:
+        for word, count in entries:
             if count >= threshold:
                 out_f.write(f"{word}\t{count}\n")
 
@@ -88,6 +107,23 @@ def calculate_N(dictionary):
     total = sum(dictionary.values())
     return total
 
+def compare_unigrams(dict_file1, dict_file2):
+    """
+    Overlap of the relative frequency distributions of two unigram files.
+    """
+    dict1 = read_unigrams(dict_file1)
+    dict2 = read_unigrams(dict_file2)
+
+    dic1N = calculate_N(dict1)
+    dic2N = calculate_N(dict2)
+
+    word_in_common = set(dict1.keys()) & set(dict2.keys())
+
+    result = 0
+    for word in sorted(word_in_common):
+        result = result + min(dict1[word]/dic1N, dict2[word]/dic2N)
+    return result
+
 def main():
 
     if len(sys.argv) < 2:
@@ -107,7 +143,11 @@ def main():
             print(f"File {input_file} does not exist. Skipping.")
         else:
             print(f"Processing input file: {input_file}")
-            result = process_file(input_file)
+            try:
+                result = process_file(input_file)
+            except Exception as e:
+                print(f"Error processing file {input_file}: {e}")
+                sys.exit(1)
 
         output_file = sys.argv[-2]
         threshold = int(sys.argv[-1])
@@ -138,22 +178,15 @@ def main():
             print("Error. Provided output directory does not exist. Exiting.")
             sys.exit(1)
 
-        for f in os.listdir(input_directory):
-            input_file = os.path.join(input_directory, f)
-            result = None
-            if os.path.isfile(input_file):
-                print(f"Processing input file: {input_file}")
-                result = process_file(input_file)
-
-            if result is not None:
-                output_file = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_file))[0]}.unigrams")
-                try:
-                    write_unigrams(output_file, result, threshold)
+        def create(input_file):
+            print(f"Processing input file: {input_file}")
+            output_file = os.path.join(output_directory, f"{os.path.splitext(os.path.basename(input_file))[0]}.unigrams")
+            write_unigrams(output_file, process_file(input_file), threshold)
+            print(f"Dictionary written to {output_file}")
+            return output_file
 
-                    print(f"Input file: {input_file}")
-                    print(f"Dictionary written to {output_file}")
-                except Exception as e:
-                    print(f"Error writing to output file {output_file}: {e}")
+        checkpoint = Checkpoint(os.path.join(output_directory, CHECKPOINT_FILE), {"command": "unigrams create-batch", "threshold": threshold})
+        run_batch(list_documents(input_directory), create, checkpoint, memory_limit())
 
     elif command == "merge-batch":
         if len(sys.argv) < 5:
@@ -163,7 +196,6 @@ def main():
         input_directory = sys.argv[2]
         output_file = sys.argv[3]
         threshold = int(sys.argv[4])
-        merged_dict = {}
 
         if not os.path.isdir(input_directory):
             print("Error. Provided input directory does not exist. Exiting.")
@@ -174,24 +206,9 @@ def main():
             print("Error. Parent directory of output file does not exist. Exiting.")
             sys.exit(1)
 
-        for f in os.listdir(input_directory):
-            dict_file = os.path.join(input_directory, f)
-            if os.path.isfile(dict_file):
-                try:
-                    dictionary = read_unigrams(dict_file)
-                    for word, count in dictionary.items():
-                        merged_dict[word] = merged_dict.get(word, 0) + int(count)
-                except Exception as e:
-                    print(f"Error reading dictionary file {dict_file}: {e}")
-
-            try:
-                with open(output_file, 'w', encoding='utf-8') as out_f:
-                    for word, count in sorted(merged_dict.items()):
-                        if count >= threshold:
-                            out_f.write(f"{word}\t{count}\n")
-                print(f"Merged dictionary {dict_file} written to {output_file}")
-            except Exception as e:
-                print(f"Error writing to output file {output_file}: {e}")
+        merge_batch(list_files(input_directory), output_file, read_unigrams, iter_unigrams,
+                    write_unigram_entries, threshold, memory_limit())
+        print(f"Merged dictionary written to {output_file}")
 
     elif command == "compare":
         if len(sys.argv) < 4:
@@ -201,17 +218,8 @@ def main():
         dict_file1 = sys.argv[2]
         dict_file2 = sys.argv[3]
 
-        dict1 = read_unigrams(dict_file1)
-        dict2 = read_unigrams(dict_file2)
-
-        dic1N = calculate_N(dict1)
-        dic2N = calculate_N(dict2)
-
-        word_in_common = set(dict1.keys()) & set(dict2.keys())
-
-        result = 0
-        for word in sorted(word_in_common):
-            result = result + min(dict1[word]/dic1N, dict2[word]/dic2N)
+        result = default_cache().get_or_compute("unigrams.compare", [dict_file1, dict_file2], (),
+                                                lambda: compare_unigrams(dict_file1, dict_file2))
 
         print(f"Result: {result}")
     elif command == "filter":
@@ -219,11 +227,15 @@ def main():
             sys.exit(1)
 
         input_file = sys.argv[2]
-        dic = read_unigrams(input_file)
-
         minthreshold = int(sys.argv[3])
         maxthreshold = int(sys.argv[4])
-        print_filtered(dic, minthreshold=minthreshold, maxthreshold=maxthreshold, skip_stopwords=True)
+
+        filtered = default_cache().get_or_compute(
+            "unigrams.filter", [input_file], (minthreshold, maxthreshold),
+            lambda: list(iter_unigrams(input_file, min_count=minthreshold, max_count=maxthreshold,
+                                       predicate=lambda w: w not in stopwords)))
+        for word, count in filtered:
+            print(f"'{word}'\t{count}")
     else:
         print(f"Unknown command: {command}")
         help()
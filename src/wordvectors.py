@@ -0,0 +1,295 @@
+import sys
+
+import numpy as np
+import scipy.sparse as sp
+
+from preprocess import stopwords
+from tokenizer import iter_file_sentences
+from unigrams import read_unigrams
+from bigrams import bigram_id_chunks
+from batch import list_inputs
+
+LEFT = "left"
+RIGHT = "right"
+BOTH = "both"
+
+def help():
+    print("Usage: python wordvectors.py <command>")
+    print("List of commands:")
+    print("  build-bigrams <unigrams_file> <bigrams_file> <output_prefix> <dim> <min_count> <left|right|both> [contexts]")
+    print("  build-corpus <unigrams_file> <input_path> <output_prefix> <dim> <min_count> <left|right|both> <window> [contexts]")
+    print("  nearest <vectors_prefix> <word> [k]")
+
+def select_vocabulary(unigrams_file, min_count, contexts="stopwords"):
+    """
+    Choose the target words (rows) and context words (columns).
+
+    Args:
+        unigrams_file: Merged .unigrams file
+        min_count: Minimum count of a target word
+        contexts: "stopwords" or the number of most frequent words to use
+    Returns:
+        Tuple (vocab, context words)
+    """
+    unigrams = read_unigrams(unigrams_file)
+    vocab = sorted(word for word, count in unigrams.items() if count >= min_count)
+    if contexts == "stopwords":
+        context_words = list(dict.fromkeys(stopwords))
+    else:
+        context_words = sorted(unigrams, key=lambda w: (-unigrams[w], w))[:int(contexts)]
+    return vocab, context_words
+
+def context_columns(sides, ncontexts):
+    """
+    Column offsets of the left and right context blocks (None if unused).
+    """
+    left = 0 if sides in (LEFT, BOTH) else None
+    right = (ncontexts if sides == BOTH else 0) if sides in (RIGHT, BOTH) else None
+    return left, right, ncontexts * (2 if sides == BOTH else 1)
+
+def matrix_from_bigrams(bigrams_file, vocab, context_words, sides=BOTH):
+    """
+    Build a sparse word x context count matrix from a merged bigram table.
+
+    A bigram (c, w) is a left context c of w, a bigram (w, c) a right one.
+
+    Returns:
+        CSR matrix of shape (len(vocab), number of context columns)
+    """
+    ids = {word: i for i, word in enumerate(vocab)}
+    for word in context_words:
+        ids.setdefault(word, len(ids))
+    row_of = np.full(len(ids), -1, dtype=np.int64)
+    row_of[:len(vocab)] = np.arange(len(vocab))
+    context_of = np.full(len(ids), -1, dtype=np.int64)
+    context_of[[ids[word] for word in context_words]] = np.arange(len(context_words))
+    left, right, ncolumns = context_columns(sides, len(context_words))
+
+    rows, cols, data = [], [], []
+    for first, second, counts in bigram_id_chunks(bigrams_file, ids):
+        for offset, target, context in ((left, second, first), (right, first, second)):
+            if offset is None:
+                continue
+            r, c = row_of[target], context_of[context]
+            keep = (r >= 0) & (c >= 0)
+            rows.append(r[keep])
+            cols.append(c[keep] + offset)
+            data.append(counts[keep])
+    return coo_to_csr(rows, cols, data, (len(vocab), ncolumns))
+
+def matrix_from_corpus(paths, vocab, context_words, sides=BOTH, window=2, chunk_sentences=10000):
+    """
+    Build a sparse word x context count matrix from raw or preprocessed text.
+
+    Contexts are counted within a sentence (tokenizer.iter_sentences), up to
+    window words away.
+
+    Returns:
+        CSR matrix of shape (len(vocab), number of context columns)
+    """
+    ids = {word: i for i, word in enumerate(vocab)}
+    for word in context_words:
+        ids.setdefault(word, len(ids))
+    row_of = np.full(len(ids) + 1, -1, dtype=np.int64)
+    row_of[:len(vocab)] = np.arange(len(vocab))
+    context_of = np.full(len(ids) + 1, -1, dtype=np.int64)
+    context_of[[ids[word] for word in context_words]] = np.arange(len(context_words))
+    unknown = len(ids)
+    left, right, ncolumns = context_columns(sides, len(context_words))
+
+    rows, cols, data = [], [], []
+
+    def add_chunk(tokens, sentences):
+        tokens = np.array(tokens, dtype=np.int64)
+        sentences = np.array(sentences, dtype=np.int64)
+        for d in range(1, window + 1):
+            same_sentence = sentences[d:] == sentences[:-d]
+            for offset, target, context in ((left, tokens[d:], tokens[:-d]), (right, tokens[:-d], tokens[d:])):
+                if offset is None:
+                    continue
+                r, c = row_of[target], context_of[context]
+                keep = same_sentence & (r >= 0) & (c >= 0)
+                rows.append(r[keep])
+                cols.append(c[keep] + offset)
+                data.append(np.ones(int(keep.sum()), dtype=np.int64))
+
+    for path in paths:
+        tokens, sentences = [], []
+        for n, sentence in enumerate(iter_file_sentences(path)):
+            tokens.extend(ids.get(word, unknown) for word in sentence)
+            sentences.extend([n] * len(sentence))
+            if n % chunk_sentences == chunk_sentences - 1:
+                add_chunk(tokens, sentences)
+                tokens, sentences = [], []
+        add_chunk(tokens, sentences)
+    return coo_to_csr(rows, cols, data, (len(vocab), ncolumns))
+
+def coo_to_csr(rows, cols, data, shape):
+    if not rows:
+        return sp.csr_matrix(shape, dtype=np.float64)
+    matrix = sp.coo_matrix((np.concatenate(data).astype(np.float64),
+                            (np.concatenate(rows), np.concatenate(cols))), shape=shape)
+    return matrix.tocsr()
+
+def ppmi(matrix, alpha=0.75):
+    """
+    Positive pointwise mutual information weighting of a sparse count matrix.
+
+    Args:
+        matrix: CSR count matrix
+        alpha: Context distribution smoothing exponent
+    Returns:
+        CSR matrix with the PPMI weights
+    """
+    matrix = matrix.tocsr(copy=True)
+    total = matrix.sum()
+    if total == 0:
+        return matrix
+    row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+    context = np.power(np.asarray(matrix.sum(axis=0)).ravel(), alpha)
+    context = context / context.sum()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    pmi = np.log(matrix.data / row_sums[rows] / context[matrix.indices])
+    matrix.data = np.maximum(pmi, 0)
+    matrix.eliminate_zeros()
+    return matrix
+
+def randomized_svd(matrix, k, oversamples=10, iterations=4, seed=0):
+    """
+    Truncated randomised SVD (Halko, Martinsson and Tropp).
+
+    Returns:
+        Tuple (U, S, Vt) with k components
+    """
+    rng = np.random.default_rng(seed)
+    size = min(k + oversamples, min(matrix.shape))
+    q = matrix @ rng.standard_normal((matrix.shape[1], size))
+    q, _ = np.linalg.qr(q)
+    for _ in range(iterations):
+        q, _ = np.linalg.qr(matrix.T @ q)
+        q, _ = np.linalg.qr(matrix @ q)
+    b = (matrix.T @ q).T
+    u, s, vt = np.linalg.svd(b, full_matrices=False)
+    return (q @ u)[:, :k], s[:k], vt[:k]
+
+def word_vectors(matrix, dim):
+    """
+    Dense word vectors from a weighted co-occurrence matrix: U * sqrt(S).
+    """
+    u, s, _ = randomized_svd(matrix, dim)
+    return (u * np.sqrt(s)).astype(np.float32)
+
+def save_vectors(prefix, vocab, vectors):
+    np.save(f"{prefix}.npy", vectors)
+    with open(f"{prefix}.vocab", 'w', encoding='utf-8') as out_f:
+        for word in vocab:
+            out_f.write(f"{word}\n")
+
+def load_vectors(prefix):
+    """
+    Load vectors saved by save_vectors; the array is memory-mapped.
+    """
+    with open(f"{prefix}.vocab", 'r', encoding='utf-8') as f:
+        vocab = [line.rstrip('\n') for line in f]
+    return vocab, np.load(f"{prefix}.npy", mmap_mode='r')
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def nearest_neighbours(vectors, queries, k=10, block_size=65536):
+    """
+    Exact cosine nearest neighbours by blocked brute force.
+
+    Args:
+        vectors: Array (n, dim), may be memory-mapped
+        queries: Array (q, dim)
+        k: Number of neighbours
+        block_size: Number of vectors compared per block
+    Returns:
+        Tuple (indices, similarities), each of shape (q, k), best first
+    """
+    queries = normalize(np.asarray(queries, dtype=np.float32))
+    k = min(k, len(vectors))
+    best_idx = np.empty((len(queries), 0), dtype=np.int64)
+    best_sim = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), block_size):
+        block = normalize(np.asarray(vectors[start:start + block_size], dtype=np.float32))
+        sims = queries @ block.T
+        idx = np.broadcast_to(np.arange(start, start + len(block)), sims.shape)
+        sims = np.concatenate((best_sim, sims), axis=1)
+        idx = np.concatenate((best_idx, idx), axis=1)
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        best_sim = np.take_along_axis(sims, top, axis=1)
+        best_idx = np.take_along_axis(idx, top, axis=1)
+    order = np.argsort(-best_sim, axis=1)
+    return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_sim, order, axis=1)
+
+def main():
+
+    if len(sys.argv) < 2:
+        help()
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "build-bigrams":
+        if len(sys.argv) < 8:
+            print("Usage: python wordvectors.py build-bigrams <unigrams_file> <bigrams_file> <output_prefix> <dim> <min_count> <left|right|both> [contexts]")
+            sys.exit(1)
+
+        unigrams_file = sys.argv[2]
+        bigrams_file = sys.argv[3]
+        output_prefix = sys.argv[4]
+        dim = int(sys.argv[5])
+        min_count = int(sys.argv[6])
+        sides = sys.argv[7]
+        contexts = sys.argv[8] if len(sys.argv) > 8 else "stopwords"
+
+        vocab, context_words = select_vocabulary(unigrams_file, min_count, contexts)
+        matrix = matrix_from_bigrams(bigrams_file, vocab, context_words, sides)
+        save_vectors(output_prefix, vocab, word_vectors(ppmi(matrix), dim))
+        print(f"Vectors written to: {output_prefix}.npy")
+
+    elif command == "build-corpus":
+        if len(sys.argv) < 9:
+            print("Usage: python wordvectors.py build-corpus <unigrams_file> <input_path> <output_prefix> <dim> <min_count> <left|right|both> <window> [contexts]")
+            sys.exit(1)
+
+        unigrams_file = sys.argv[2]
+        input_path = sys.argv[3]
+        output_prefix = sys.argv[4]
+        dim = int(sys.argv[5])
+        min_count = int(sys.argv[6])
+        sides = sys.argv[7]
+        window = int(sys.argv[8])
+        contexts = sys.argv[9] if len(sys.argv) > 9 else "stopwords"
+
+        vocab, context_words = select_vocabulary(unigrams_file, min_count, contexts)
+        matrix = matrix_from_corpus(list_inputs(input_path), vocab, context_words, sides, window)
+        save_vectors(output_prefix, vocab, word_vectors(ppmi(matrix), dim))
+        print(f"Vectors written to: {output_prefix}.npy")
+
+    elif command == "nearest":
+        if len(sys.argv) < 4:
+            print("Usage: python wordvectors.py nearest <vectors_prefix> <word> [k]")
+            sys.exit(1)
+
+        vocab, vectors = load_vectors(sys.argv[2])
+        word = sys.argv[3]
+        k = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+        if word not in vocab:
+            print(f"Word {word} not in vocabulary.")
+            sys.exit(1)
+
+        indices, similarities = nearest_neighbours(vectors, vectors[vocab.index(word)][None, :], k)
+        for i, similarity in zip(indices[0], similarities[0]):
+            print(f"{vocab[i]}\t{similarity:.4f}")
+
+    else:
+        print(f"Unknown command: {command}")
+        help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()